@@ -1,80 +1,35 @@
 # app.py
-from flask import Flask, jsonify, make_response, render_template, request, redirect, send_from_directory, url_for, session, flash, g
-from authlib.integrations.flask_client import OAuth
+from flask import Flask, current_app, jsonify, make_response, render_template, request, redirect, send_from_directory, url_for, session, flash, g
+import logging
 import os
+import threading
 from functools import wraps
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from routes.user_routes import user_routes
 
 # Load environment variables
 load_dotenv()
 
-# Initialize MongoDB connection - don't import db directly yet
+# Structured, queue-backed logging (see config/log_config.py)
+from config.log_config import setup_logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Initialize MongoDB connection - the client itself is created lazily on first use
 from database.mongo import db_connection
 
 # Import routes
-from routes.user_routes import user_routes
-
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY', 'b3f7ac0694f59e4983adb080c3f4ca48621b0b0ce1759d07422cabf6b5bd7ea4')
-
-# Initialize MongoDB with app
-db_connection.init_app(app)
-
-# Session Configuration
-app.config.update(
-    PERAMENTENT_SESSION_LIFETIME=timedelta(days=30),
-    SESSION_COOKIE_NAME='dastawez_session',
-    SESSION_COOKIE_SECURE=True,
-    SESSION_COOKIE_HTTPONLY=True,
-    SESSION_COOKIE_SAMESITE='Lax',
-    SESSION_PROTECTION='strong',
-
-    REMEMBER_COOKIE_DURATION=timedelta(days=30),
-    REMEMBER_COOKIE_SECURE=True,
-    REMEMBER_COOKIE_HTTPONLY=True,
-    REMEMBER_COOKIE_SAMESITE='Lax',
-    # Add MongoDB URI to config
-    MONGO_URI=os.getenv("MONGO_URI"),
-    DB_NAME=os.getenv("DB_NAME", "dastawez")
-)
-
-
-@app.before_request
-def before_request():
-    """Make the database accessible via 'g' during requests"""
-    g.db = db_connection.get_db()
-
-    #check session cookie
-    session_id = request.cookies.get('SESSION_COOKIE_NAME')
-    if session_id:
-        user_session =user_session.get_by_id(session_id)
-        if user_session and user_session.is_valid():
-            from services.user_service import get_user_by_email
-            use = get_user_by_email(user_session.user_email)
-            if user:
-                g.user = user = {
-                    'name': user.get('name'),
-                    'email': user.get('email'),
-                    'picture': user.get('picture')
-                }
+from routes.user_routes import user_routes, parse_listing_args, stream_users_response
+from routes.document_routes import document_routes
+from routes.print_routes import print_routes
+from routes.file_routes import file_routes
+from services.response_cache import cached_view
 
 
-@app.route('/manifest.json')
-def manifest():
-    return send_from_directory('static', 'manifest.json')
-
-@app.route('/service-worker.js')
-def service_worker():
-    response = send_from_directory('static', 'service-worker.js')
-    response.headers['Content-Type'] = 'application/javascript'
-    response.headers['Service-Worker-Allowed'] = '/'
-    return response
+def before_request():
+    """Expose the logged-in user from the server-side session as g.user"""
+    g.user = session.get('user')
 
-# OAuth Configuration
-oauth = OAuth(app)
 
 # Determine redirect URI based on environment
 if os.getenv('VERCEL'):
@@ -82,19 +37,39 @@ if os.getenv('VERCEL'):
 else:
     REDIRECT_URI = 'http://127.0.0.1:5000/auth/callback'
 
-print(f"🔧 Using Redirect URI: {REDIRECT_URI}")
-
-# Register Google OAuth
-google = oauth.register(
-    name='google',
-    client_id=os.getenv("GOOGLE_CLIENT_ID"),
-    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile',
-        'redirect_uri': REDIRECT_URI
-    }
-)
+_oauth_lock = threading.Lock()
+
+def get_google():
+    """Google OAuth client, registered on first use.
+
+    authlib stays off the cold-start path. Discovery metadata and the JWKS
+    come from services/oidc.py, which keeps them cached in MongoDB across
+    cold starts. A LocalOIDCProvider installed with use_local_provider
+    replaces Google entirely.
+    """
+    client = current_app.extensions.get('google_oauth')
+    if client is None:
+        with _oauth_lock:
+            client = current_app.extensions.get('google_oauth')
+            if client is None:
+                from services.oidc import CachedOAuth
+
+                provider = current_app.extensions.get('oidc_provider')
+                logger.info("Registering Google OAuth client, redirect URI: %s", REDIRECT_URI)
+                oauth = CachedOAuth(current_app)
+                client = oauth.register(
+                    name='google',
+                    client_id=provider.client_id if provider else os.getenv("GOOGLE_CLIENT_ID"),
+                    client_secret=None if provider else os.getenv("GOOGLE_CLIENT_SECRET"),
+                    server_metadata_url=(provider.discovery_url if provider
+                                         else 'https://accounts.google.com/.well-known/openid-configuration'),
+                    client_kwargs={
+                        'scope': 'openid email profile',
+                        'redirect_uri': REDIRECT_URI
+                    }
+                )
+                current_app.extensions['google_oauth'] = client
+    return client
 
 # Initialize database connection
 def get_users_collection():
@@ -102,19 +77,6 @@ def get_users_collection():
     db = db_connection.get_db()
     return db['users']
 
-# Import and initialize indexes AFTER db is ready
-def initialize_database():
-    """Initialize database indexes"""
-    try:
-        from services.user_service import create_indexes
-        create_indexes()
-        print("✅ Database indexes created successfully")
-    except Exception as e:
-        print(f"⚠️ Could not create indexes: {e}")
-
-# Call initialization
-initialize_database()
-
 # Decorator for protected routes
 def login_required(f):
     @wraps(f)
@@ -126,49 +88,59 @@ def login_required(f):
     return decorated_function
 
 # Routes
-@app.route('/')
+def manifest():
+    return send_from_directory('static', 'manifest.json', max_age=3600)
+
+def service_worker():
+    # Versioned by the precache manifest and always revalidated by browsers
+    from services.precache import service_worker_response
+    return service_worker_response()
+
+def precache_manifest():
+    """Static dependencies of the templates for the service worker to precache"""
+    from services.precache import precache_manifest_response
+    return precache_manifest_response()
+
+@cached_view(ttl=300)
 def index():
     user = session.get('user')
     if user:
         return redirect(url_for('dashboard'))
     return render_template('index.html', user=user)
 
-@app.route('/login')
 def login():
     try:
-        print(f"🔗 Using redirect URI: {REDIRECT_URI}")
-        return google.authorize_redirect(REDIRECT_URI)
+        return get_google().authorize_redirect(REDIRECT_URI)
     except Exception as e:
         flash('Login service is temporarily unavailable.', 'error')
-        print(f"❌ Login error: {e}")
+        logger.error("Login error: %s", e, extra={"msg_type": "auth.login"})
         return redirect(url_for('index'))
 
-@app.route('/auth/callback')
 def auth_callback():
     try:
-        print("🔄 OAuth callback started...")
+        from services.oidc import login_userinfo
+
+        google = get_google()
+        # Verifies the ID token locally against the cached JWKS
         token = google.authorize_access_token()
-        user_info = google.userinfo()
+        user_info = login_userinfo(google, token)
         
         if user_info:
-            print(f"✅ User info received: {user_info.get('email')}")
             user_data = {
                 'id': user_info.get('sub'),
                 'name': user_info.get('name'),
                 'email': user_info.get('email'),
                 'picture': user_info.get('picture')
             }
-            
-            print(f"📋 Saving user data: {user_data}")
-            
-            from services.user_service import save_user_data
-            save_success = save_user_data(user_data, {
+
+            from services.user_service import record_login
+            save_success = record_login(user_data, {
                 'access_token': token.get('access_token'),
                 'refresh_token': token.get('refresh_token')
             })
-            
-            print(f"💾 Save result: {save_success}")
-            
+            logger.info("OAuth login for %s, saved: %s", user_data['email'], save_success,
+                        extra={"msg_type": "auth.callback"})
+
             if save_success:
                 session.clear()
                 session['user'] = {
@@ -188,26 +160,24 @@ def auth_callback():
             
     except Exception as e:
         flash('Login error. Please try again.', 'error')
-        print(f"❌ Auth callback error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Auth callback error: %s", e, extra={"msg_type": "auth.callback"})
     
     return redirect(url_for('index'))
 
-@app.route('/logout')
 def logout():
     session.pop('user', None)
     flash('You have been logged out.', 'info')
     return redirect(url_for('index'))
 
-@app.route('/dashboard')
 # @login_required # Temporarily commented out for debugging
+@cached_view(ttl=60)
 def dashboard():
     user = session.get('user')
     if user:
         from services.user_service import get_user_by_email
         db_user = get_user_by_email(user['email'])
-        print(f"📊 Dashboard accessed by: {user['email']}, DB user: {db_user is not None}")
+        logger.debug("Dashboard accessed by %s, DB user: %s", user['email'], db_user is not None,
+                     extra={"msg_type": "dashboard.view"})
         
         # Add current date to template
         return render_template(
@@ -218,31 +188,40 @@ def dashboard():
         )
     return redirect(url_for('index'))
 
-@app.route('/admin')
+ADMIN_PAGE_SIZE = 100
+
 @login_required
 def admin_users():
-    from services.user_service import get_all_users
-    users = get_all_users()
-    return render_template('admin_users.html', users=users, current_user=session.get('user'))
+    """Maintained user statistics and one page of users, newest first"""
+    from services.user_service import get_users_page
+    from services.user_stats import admin_stats
+    after = request.args.get('after')
+    try:
+        users, next_cursor = get_users_page(limit=ADMIN_PAGE_SIZE, after=after)
+    except Exception as e:
+        logger.error("Error loading admin user page: %s", e)
+        users, next_cursor = [], None
+    return render_template('admin_users.html', users=users, next_cursor=next_cursor,
+                           stats=admin_stats(), current_user=session.get('user'))
 
 # Debug routes
-@app.route('/debug')
 def debug():
+    from services.user_service import get_cache_stats
     return {
         'vercel_env': os.getenv('VERCEL'),
         'vercel_url': os.getenv('VERCEL_URL'),
         'redirect_uri': REDIRECT_URI,
         'session_user': session.get('user'),
         'python_version': os.sys.version,
-        'mongo_connected': db_connection.client is not None
+        'mongo_connected': db_connection.client is not None,
+        'user_cache': get_cache_stats()
     }
 
-@app.route('/debug/db')
 def debug_db():
     """Debug database connection"""
     try:
         users_collection = get_users_collection()
-        users_count = users_collection.count_documents({})
+        users_count = users_collection.estimated_document_count()
         users = list(users_collection.find({}, {'_id': 0, 'name': 1, 'email': 1}).limit(5))
         
         return {
@@ -259,7 +238,6 @@ def debug_db():
             'error': str(e)
         }
 
-@app.route('/debug/save-test')
 def debug_save_test():
     """Test user save functionality"""
     from services.user_service import save_user_data
@@ -283,7 +261,16 @@ def debug_save_test():
         "connection_alive": db_connection.client is not None
     }
 
-@app.route('/debug/ping')
+def debug_metrics():
+    """MongoDB command and pool metrics in Prometheus text format"""
+    from services.metrics import registry, CONTENT_TYPE
+    return registry.render(), 200, {'Content-Type': CONTENT_TYPE}
+
+def debug_routes():
+    """Per-route request counts and p50/p95/p99 latency"""
+    from services.request_metrics import route_latency_report
+    return route_latency_report()
+
 def debug_ping():
     """Ping MongoDB to check connection"""
     try:
@@ -302,58 +289,159 @@ def debug_ping():
 
 
 
-@app.route('/profile')
 @login_required
 def profile():
     return render_template('profile.html', user=session.get('user'))
 
-@app.route('/orders')
 @login_required
 def orders():
     return render_template('orders.html', user=session.get('user'))
 
-@app.route('/settings')
 @login_required
 def settings():
     return render_template('settings.html', user=session.get('user'))
 
-@app.route('/edit_profile')
 @login_required
 def edit_profile():
     return render_template('edit_profile.html', user=session.get('user'))
 
 # Add similar routes for services
-@app.route('/document_creation')
 @login_required
 def document_creation():
-    return render_template('document_creation.html', user=session.get('user'))
+    return render_template('document_creation.html', user=session.get('user'),
+                           template_id='application_letter')
 
 
 # Add similar routes for services
-@app.route('/affidavit_creation')
 @login_required
 def affidavit_creation():
-    return render_template('document_creation.html', user=session.get('user'))
+    return render_template('document_creation.html', user=session.get('user'),
+                           template_id='affidavit')
 
 
 # Add similar routes for services
-@app.route('/document_printing')
 @login_required
 def document_printing():
     return render_template('document_printing.html', user=session.get('user'))
 
 
 
-@app.route("/get-users", methods=["GET"])
 def get_users():
-    users_collection = get_users_collection()   # <--- define it here
-    data = list(users_collection.find({}, {"_id": 0}))
-    return jsonify(data)
-
-
+    """Stream users as a JSON array (supports limit/after/fields)"""
+    try:
+        limit, after, fields = parse_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return stream_users_response(after=after, fields=fields, limit=limit, include_id=False)
+
+
+def register_routes(app):
+    """Attach the page, auth and debug views to the app"""
+    app.add_url_rule('/manifest.json', view_func=manifest)
+    app.add_url_rule('/service-worker.js', view_func=service_worker)
+    app.add_url_rule('/precache-manifest.json', view_func=precache_manifest)
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/login', view_func=login)
+    app.add_url_rule('/auth/callback', view_func=auth_callback)
+    app.add_url_rule('/logout', view_func=logout)
+    app.add_url_rule('/dashboard', view_func=dashboard)
+    app.add_url_rule('/admin', view_func=admin_users)
+    app.add_url_rule('/debug', view_func=debug)
+    app.add_url_rule('/debug/db', view_func=debug_db)
+    app.add_url_rule('/debug/save-test', view_func=debug_save_test)
+    app.add_url_rule('/debug/ping', view_func=debug_ping)
+    app.add_url_rule('/debug/metrics', view_func=debug_metrics)
+    app.add_url_rule('/debug/routes', view_func=debug_routes)
+    app.add_url_rule('/profile', view_func=profile)
+    app.add_url_rule('/orders', view_func=orders)
+    app.add_url_rule('/settings', view_func=settings)
+    app.add_url_rule('/edit_profile', view_func=edit_profile)
+    app.add_url_rule('/document_creation', view_func=document_creation)
+    app.add_url_rule('/affidavit_creation', view_func=affidavit_creation)
+    app.add_url_rule('/document_printing', view_func=document_printing)
+    app.add_url_rule("/get-users", view_func=get_users, methods=["GET"])
+
+def create_app():
+    """Build the Flask app.
+
+    Nothing here touches the network: MongoDB connects on the first query,
+    OAuth registers on the first login and indexes are created by the
+    ``flask migrate`` command rather than on every boot.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.getenv('SECRET_KEY', 'b3f7ac0694f59e4983adb080c3f4ca48621b0b0ce1759d07422cabf6b5bd7ea4')
+
+    # Session Configuration
+    app.config.update(
+        PERMANENT_SESSION_LIFETIME=timedelta(days=30),
+        SESSION_REFRESH_MINUTES=float(os.getenv('SESSION_REFRESH_MINUTES', '15')),
+        SESSION_COOKIE_NAME='dastawez_session',
+        SESSION_COOKIE_SECURE=True,
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SAMESITE='Lax',
+        SESSION_PROTECTION='strong',
+
+        REMEMBER_COOKIE_DURATION=timedelta(days=30),
+        REMEMBER_COOKIE_SECURE=True,
+        REMEMBER_COOKIE_HTTPONLY=True,
+        REMEMBER_COOKIE_SAMESITE='Lax',
+        # Add MongoDB URI to config
+        MONGO_URI=os.getenv("MONGO_URI"),
+        DB_NAME=os.getenv("DB_NAME", "dastawez")
+    )
+
+    # Initialize MongoDB with app
+    db_connection.init_app(app)
+
+    # Fingerprinted, precompressed static assets (see build_assets.py)
+    from services.static_assets import init_static_assets
+    init_static_assets(app)
+
+    # Whole-page and {% cache %} fragment caching (services/response_cache.py)
+    from services.response_cache import init_response_cache
+    init_response_cache(app)
+
+    # Server-side sessions in MongoDB (services/session_store.py)
+    from services.session_store import MongoSessionInterface
+    app.session_interface = MongoSessionInterface()
+
+    # orjson-backed JSON with native ObjectId/datetime/User encoding
+    from services.json_provider import init_json
+    init_json(app)
+
+    # Per-route latency and slow-request tracing
+    from services.request_metrics import init_request_metrics
+    init_request_metrics(app)
+
+    # Register blueprints
+    app.register_blueprint(user_routes)
+    app.register_blueprint(document_routes)
+    app.register_blueprint(print_routes)
+    app.register_blueprint(file_routes)
+
+    app.before_request(before_request)
+    register_routes(app)
+
+    from database.migrations import register_commands
+    register_commands(app)
+
+    from database import query_audit
+    query_audit.register_commands(app)
+
+    from services import document_jobs
+    document_jobs.register_commands(app)
+
+    from services import print_queue
+    print_queue.register_commands(app)
+
+    from services import file_storage
+    file_storage.register_commands(app)
+
+    return app
+
+
+app = create_app()
 
 
 if __name__ == '__main__':
-        # Connect to MongoDB
-    db = db_connection.get_db()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,323 @@
+# benchmarks/bench_api.py
+"""Throughput and latency benchmark for the auth, dashboard and user API paths.
+
+Boots the Flask app against a local mongod (or mongomock with --in-memory),
+seeds users and sessions, and measures each scenario at every requested
+collection size. Results are written to JSON so runs can be compared across
+commits. Exits non-zero when any scenario had errors. Usage:
+
+    python benchmarks/bench_api.py --sizes 1000,100000 --requests 2000 --concurrency 8
+    python benchmarks/bench_api.py --in-memory --sizes 1000
+    python benchmarks/bench_api.py --sizes 1000000 --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = (
+    "save_user_data",
+    "get_user_by_email",
+    "/dashboard",
+    "/users",
+    "/users/search",
+    "/users/count",
+    "/get-users",
+)
+
+# Scenarios mongomock cannot run, with the reason; skipped under --in-memory
+IN_MEMORY_UNSUPPORTED = {
+    "/users/search": "mongomock does not implement $setIntersection",
+}
+
+FIRST_NAMES = ("aarav", "priya", "rahul", "neha", "vikram", "anita", "rohan", "sunita", "arjun", "kavya")
+LAST_NAMES = ("sharma", "verma", "patel", "khan", "singh", "gupta", "joshi", "mehta", "naidu", "das")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def fake_user(i):
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return {
+        "id": f"bench-{i}",
+        "name": f"{first.title()} {last.title()} {i}",
+        "email": f"{first}.{last}.{i}@bench.example.com",
+        "picture": f"https://example.com/avatars/{i}.png"
+    }
+
+
+def seed(db, size, sessions, batch_size=10000):
+    """Insert ``size`` users and ``sessions`` sessions directly (no app code)"""
+    from services.user_search import build_search_fields
+
+    db["users"].delete_many({})
+    db["sessions"].delete_many({})
+
+    now = datetime.utcnow()
+    batch = []
+    for i in range(size):
+        user = fake_user(i)
+        doc = {
+            "google_id": user["id"],
+            "name": user["name"],
+            "email": user["email"],
+            "picture": user["picture"],
+            "created_at": now - timedelta(minutes=i),
+            "last_login": now - timedelta(minutes=i % 43200),
+            "access_token": None,
+            "refresh_token": None
+        }
+        doc.update(build_search_fields(doc["name"], doc["email"]))
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            db["users"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db["users"].insert_many(batch, ordered=False)
+
+    batch = []
+    for i in range(sessions):
+        user = fake_user(random.randrange(size))
+        batch.append({
+            "session_id": secrets.token_urlsafe(32),
+            "user_email": user["email"],
+            "created_at": now,
+            "expires_at": now + timedelta(days=30)
+        })
+        if len(batch) >= batch_size:
+            db["sessions"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db["sessions"].insert_many(batch, ordered=False)
+
+
+class Scenario:
+    """Runs one operation ``requests`` times across ``concurrency`` threads"""
+
+    def __init__(self, name, make_call, requests, concurrency):
+        self.name = name
+        self.make_call = make_call
+        self.requests = requests
+        self.concurrency = concurrency
+
+    def run(self):
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        per_worker = max(1, self.requests // self.concurrency)
+
+        def worker(worker_id):
+            call = self.make_call(worker_id)
+            local = []
+            local_errors = 0
+            for _ in range(per_worker):
+                started = time.perf_counter()
+                try:
+                    ok = call()
+                except Exception:
+                    ok = False
+                local.append(time.perf_counter() - started)
+                if not ok:
+                    local_errors += 1
+            with lock:
+                latencies.extend(local)
+                errors[0] += local_errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(worker, range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        ordered = sorted(latencies)
+        return {
+            "requests": len(ordered),
+            "errors": errors[0],
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+            "mean_ms": round(statistics.mean(ordered) * 1000, 3) if ordered else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0
+        }
+
+
+def build_scenarios(app, size, args):
+    from services import user_service
+
+    hot_users = [fake_user(random.randrange(size)) for _ in range(min(size, args.hot_users))]
+    search_terms = [u["name"].split()[0][:3] for u in hot_users[:100]] + [u["email"][:6] for u in hot_users[:100]]
+
+    def http_client(worker_id):
+        client = app.test_client()
+        user = hot_users[worker_id % len(hot_users)]
+        with client.session_transaction() as sess:
+            sess["user"] = {"name": user["name"], "email": user["email"], "picture": user["picture"]}
+        return client
+
+    def http(path_fn):
+        def make_call(worker_id):
+            client = http_client(worker_id)
+
+            def call():
+                response = client.get(path_fn())
+                response.get_data()
+                return response.status_code < 400
+            return call
+        return make_call
+
+    def save_call(worker_id):
+        def call():
+            i = random.randrange(size * 2)  # about half updates, half inserts
+            return user_service.save_user_data(fake_user(i), {"access_token": "bench"})
+        return call
+
+    def lookup_call(worker_id):
+        def call():
+            return user_service.get_user_by_email(random.choice(hot_users)["email"]) is not None
+        return call
+
+    listing_limit = args.listing_limit
+    return {
+        "save_user_data": save_call,
+        "get_user_by_email": lookup_call,
+        "/dashboard": http(lambda: "/dashboard"),
+        "/users": http(lambda: "/users?limit=50"),
+        "/users/search": http(lambda: f"/users/search?q={random.choice(search_terms)}"),
+        "/users/count": http(lambda: "/users/count"),
+        "/get-users": http(lambda: f"/get-users?limit={listing_limit}"),
+    }
+
+
+def connect(args):
+    from database.mongo import db_connection
+
+    if args.in_memory:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--in-memory needs mongomock: pip install -r requirements-dev.txt")
+        return db_connection.use_client(mongomock.MongoClient(), args.db_name)
+
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["DB_NAME"] = args.db_name
+    return db_connection.get_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000",
+                        help="Comma-separated user counts to seed")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=1000, help="Operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hot-users", type=int, default=2000,
+                        help="Size of the working set used for lookups and sessions")
+    parser.add_argument("--listing-limit", type=int, default=1000,
+                        help="limit passed to /get-users")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="dastawez_bench")
+    parser.add_argument("--in-memory", action="store_true", help="Use mongomock instead of mongod")
+    parser.add_argument("--output", help="JSON output path (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("SLOW_REQUEST_MS", "0")
+    db = connect(args)
+
+    import app as app_module
+    from database.migrations import migrate
+    from services.user_cache import user_cache
+
+    app = app_module.app
+    app.config.update(TESTING=True, SESSION_COOKIE_SECURE=False)
+
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    skipped = {}
+    if args.in_memory:
+        skipped = {name: IN_MEMORY_UNSUPPORTED[name] for name in selected if name in IN_MEMORY_UNSUPPORTED}
+        for name, reason in skipped.items():
+            print(f"⚠️  Skipping {name}: {reason}", file=sys.stderr)
+        selected = [name for name in selected if name not in skipped]
+
+    results = {
+        "benchmark": "api",
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "backend": "mongomock" if args.in_memory else "mongod",
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "skipped": skipped,
+        "sizes": {}
+    }
+
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"Seeding {size} users and {args.sessions} sessions...", file=sys.stderr)
+        started = time.perf_counter()
+        seed(db, size, args.sessions)
+        db["meta"].delete_many({})
+        migrate()
+        user_cache.clear()
+        seeded_in = time.perf_counter() - started
+
+        scenarios = build_scenarios(app, size, args)
+        size_results = {"seed_s": round(seeded_in, 1), "scenarios": {}}
+        for name in selected:
+            print(f"  {size} users: {name}", file=sys.stderr)
+            size_results["scenarios"][name] = Scenario(
+                name, scenarios[name], args.requests, args.concurrency
+            ).run()
+        size_results["user_cache"] = user_cache.stats()
+        results["sizes"][str(size)] = size_results
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+
+    failed = [
+        (size, name, scenario["errors"])
+        for size, size_results in results["sizes"].items()
+        for name, scenario in size_results["scenarios"].items()
+        if scenario["errors"]
+    ]
+    for size, name, errors in failed:
+        print(f"❌ {size} users: {name} had {errors} errors", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
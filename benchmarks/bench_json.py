@@ -0,0 +1,74 @@
+# benchmarks/bench_json.py
+"""Micro-benchmark: JSON encoding of user lists, orjson provider vs stdlib provider.
+
+    python benchmarks/bench_json.py --users 1000 --repeat 50
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bson import ObjectId
+from flask import Flask
+
+from models.user_model import User
+from services.json_provider import MongoJSONProvider, OrjsonProvider, orjson
+
+
+def make_documents(count):
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "google_id": f"1098{i:012d}",
+        "name": f"Bench User {i}",
+        "email": f"bench.user.{i}@example.com",
+        "picture": f"https://example.com/avatars/{i}.png",
+        "created_at": now - timedelta(days=i % 365),
+        "last_login": now - timedelta(minutes=i)
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    if orjson is None:
+        sys.exit("orjson is not installed: pip install -r requirements.txt")
+
+    app = Flask(__name__)
+    providers = {"stdlib": MongoJSONProvider(app), "orjson": OrjsonProvider(app)}
+
+    documents = make_documents(args.users)
+    payloads = {
+        "documents": {"users": documents, "next": None},
+        "user_objects": [User.from_dict(doc) for doc in documents]
+    }
+
+    results = {"benchmark": "json", "users": args.users, "repeat": args.repeat, "cases": {}}
+    for payload_name, payload in payloads.items():
+        case = {}
+        for provider_name, provider in providers.items():
+            seconds = min(timeit.repeat(lambda: provider.dumps(payload), number=1, repeat=args.repeat))
+            case[provider_name] = {
+                "best_ms": round(seconds * 1000, 3),
+                "users_per_s": round(args.users / seconds)
+            }
+        case["speedup"] = round(case["stdlib"]["best_ms"] / case["orjson"]["best_ms"], 2)
+        results["cases"][payload_name] = case
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
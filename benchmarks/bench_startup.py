@@ -0,0 +1,98 @@
+# benchmarks/bench_startup.py
+"""Cold-start benchmark: import time of app.py and time to the first response.
+
+Every sample runs in a fresh interpreter so nothing is shared between runs,
+the same way a new serverless instance starts. Usage:
+
+    python benchmarks/bench_startup.py --runs 20 --output startup.json
+    python benchmarks/bench_startup.py --max-import-ms 400   # fail on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in the child interpreter; prints one JSON line with its timings.
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+client = app_module.app.test_client()
+response = client.get(sys.argv[1])
+responded = time.perf_counter()
+heavy = [m for m in ("authlib", "pymongo", "gridfs") if m in sys.modules]
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_response_ms": (responded - imported) * 1000,
+    "total_ms": (responded - start) * 1000,
+    "status": response.status_code,
+    "heavy_modules": heavy
+}))
+"""
+
+
+def run_once(path):
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, path],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples, key):
+    values = [s[key] for s in samples]
+    return {
+        "median": statistics.median(values),
+        "p95": percentile(values, 95),
+        "min": min(values),
+        "max": max(values)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--path", default="/", help="URL of the first request")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--max-import-ms", type=float,
+                        help="Exit non-zero when the median import time exceeds this")
+    args = parser.parse_args()
+
+    samples = [run_once(args.path) for _ in range(args.runs)]
+    results = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "path": args.path,
+        "status": samples[-1]["status"],
+        "heavy_modules_at_first_response": samples[-1]["heavy_modules"],
+        "import_ms": summarize(samples, "import_ms"),
+        "first_response_ms": summarize(samples, "first_response_ms"),
+        "total_ms": summarize(samples, "total_ms")
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_import_ms is not None and results["import_ms"]["median"] > args.max_import_ms:
+        print(f"❌ Median import time {results['import_ms']['median']:.1f}ms "
+              f"exceeds {args.max_import_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
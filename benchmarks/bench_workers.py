@@ -0,0 +1,173 @@
+# benchmarks/bench_workers.py
+"""Worker-model benchmark: throughput and latency of the app under gunicorn.
+
+Starts gunicorn with gunicorn.conf.py once per worker model (sync workers,
+gthread workers, a single threaded process like ``app.run``), drives HTTP
+load against a few paths and reports requests/s and latency percentiles.
+Needs gunicorn and a reachable MongoDB (MONGO_URI). Usage:
+
+    python benchmarks/bench_workers.py --requests 5000 --concurrency 64
+    python benchmarks/bench_workers.py --models gthread --workers 2,4,8 --output workers.json
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> gunicorn settings; "workers": None means one per core
+MODELS = {
+    "single": {"worker_class": "gthread", "workers": 1, "threads": 8},
+    "sync": {"worker_class": "sync", "workers": None, "threads": 1},
+    "gthread": {"worker_class": "gthread", "workers": None, "threads": 8},
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def start_server(model, workers, port):
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.update({
+        "BIND": f"127.0.0.1:{port}",
+        "GUNICORN_WORKER_CLASS": model["worker_class"],
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_THREADS": str(model["threads"]),
+        "GUNICORN_ACCESS_LOG": "/dev/null",
+        "LOG_LEVEL": "warning",
+    })
+    env.pop("MONGO_MAX_POOL_SIZE", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_ready(base_url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            urllib.request.urlopen(base_url + "/manifest.json", timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def drive(base_url, path, requests, concurrency):
+    """Send ``requests`` GETs from ``concurrency`` threads; returns the measurements"""
+    def call(_):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=30) as response:
+                response.read()
+                ok = response.status < 500
+        except urllib.error.HTTPError as e:
+            ok = e.code < 500
+        except (urllib.error.URLError, ConnectionError):
+            ok = False
+        return time.perf_counter() - started, ok
+
+    # Warm every worker's templates and connection pool before measuring
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(concurrency * 2)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    return {
+        "requests": requests,
+        "errors": sum(1 for s in samples if not s[1]),
+        "requests_per_second": requests / elapsed,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", default=",".join(MODELS), help="Comma-separated worker models")
+    parser.add_argument("--workers", default="", help="Comma-separated worker counts (default: CPU count)")
+    parser.add_argument("--paths", default="/,/debug/db", help="Comma-separated URLs to load")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    worker_counts = [int(n) for n in args.workers.split(",") if n] or [cpus]
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    runs = []
+    for name in args.models.split(","):
+        model = MODELS[name]
+        for workers in ([model["workers"]] if model["workers"] else worker_counts):
+            print(f"🚀 {name}: {workers} workers x {model['threads']} threads")
+            process = start_server(model, workers, args.port)
+            try:
+                wait_ready(base_url, process)
+                for path in args.paths.split(","):
+                    result = drive(base_url, path, args.requests, args.concurrency)
+                    runs.append(dict(result, model=name, workers=workers, threads=model["threads"], path=path))
+                    print(f"   {path}: {result['requests_per_second']:.0f} req/s, "
+                          f"p95 {result['latency_ms']['p95']:.1f}ms, {result['errors']} errors")
+            finally:
+                stop_server(process)
+
+    results = {
+        "benchmark": "workers",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": cpus,
+        "concurrency": args.concurrency,
+        "runs": runs
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# benchmarks/compare.py
+"""Compare two bench_api.py result files scenario by scenario.
+
+    python benchmarks/compare.py benchmarks/results/abc123.json benchmarks/results/def456.json
+"""
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__.strip())
+
+    base, head = load(sys.argv[1]), load(sys.argv[2])
+    print(f"{base['commit']} -> {head['commit']}")
+    for size, head_size in head["sizes"].items():
+        base_size = base["sizes"].get(size)
+        if not base_size:
+            continue
+        print(f"\n{size} users")
+        print(f"  {'scenario':<20} {'rps':>18} {'p50 ms':>18} {'p99 ms':>18}")
+        for name, after in head_size["scenarios"].items():
+            before = base_size["scenarios"].get(name)
+            if not before:
+                continue
+            print(
+                f"  {name:<20} "
+                f"{change(before['throughput_rps'], after['throughput_rps']):>18} "
+                f"{change(before['p50_ms'], after['p50_ms']):>18} "
+                f"{change(before['p99_ms'], after['p99_ms']):>18}"
+            )
+
+
+if __name__ == "__main__":
+    main()
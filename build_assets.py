@@ -0,0 +1,120 @@
+# build_assets.py
+"""Fingerprint static assets and precompress them.
+
+Copies every file under static/ to static/dist/ with a content hash in its
+name, writes gzip (and brotli, when the ``brotli`` package is installed)
+variants next to it, and records the mapping in
+static/dist/asset-manifest.json. ``url_for('static', ...)`` resolves through
+that manifest (see services/static_assets.py). Run after generate_icons.py:
+
+    python generate_icons.py && python build_assets.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_NAME = "asset-manifest.json"
+
+# Served at fixed URLs and must never be renamed
+EXCLUDED = {"service-worker.js"}
+
+# Compressing these gains nothing
+PRECOMPRESSED_TYPES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".woff", ".woff2", ".ico"}
+MIN_COMPRESS_SIZE = 512
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(relative_path, digest):
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest[:12]}{ext}"
+
+
+def write_compressed(path, data):
+    """Write .gz/.br variants that are smaller than the original; return encodings"""
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            with open(path + ".br", "wb") as f:
+                f.write(compressed)
+            encodings.append("br")
+
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + ".gz", "wb") as f:
+            f.write(compressed)
+        encodings.append("gzip")
+    return encodings
+
+
+def iter_sources():
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        if os.path.abspath(dirpath).startswith(os.path.abspath(DIST_DIR)):
+            continue
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            relative = os.path.relpath(os.path.join(dirpath, filename), STATIC_DIR).replace(os.sep, "/")
+            if relative not in EXCLUDED:
+                yield relative
+
+
+def build():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    assets = {}
+    for relative in sorted(iter_sources()):
+        source = os.path.join(STATIC_DIR, relative)
+        digest = file_digest(source)
+        target_relative = "dist/" + hashed_name(relative, digest)
+        target = os.path.join(STATIC_DIR, target_relative)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+
+        encodings = []
+        ext = os.path.splitext(relative)[1].lower()
+        if ext not in PRECOMPRESSED_TYPES and os.path.getsize(source) >= MIN_COMPRESS_SIZE:
+            with open(source, "rb") as f:
+                encodings = write_compressed(target, f.read())
+
+        assets[relative] = {
+            "path": target_relative,
+            "etag": digest[:32],
+            "size": os.path.getsize(source),
+            "encodings": encodings
+        }
+        print(f"✅ {relative} -> {target_relative} {' '.join(encodings)}")
+
+    version = hashlib.sha256(
+        json.dumps(assets, sort_keys=True).encode()
+    ).hexdigest()[:12]
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), "w") as f:
+        json.dump({"version": version, "assets": assets}, f, indent=2, sort_keys=True)
+
+    if brotli is None:
+        print("💡 Install 'brotli' to also emit .br variants")
+    print(f"🎉 {len(assets)} assets fingerprinted (version {version})")
+
+
+if __name__ == "__main__":
+    build()
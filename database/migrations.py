@@ -0,0 +1,147 @@
+# database/migrations.py
+from datetime import datetime
+from database.mongo import db_connection
+
+# Document in the ``meta`` collection that records the applied schema version
+SCHEMA_DOC_ID = "schema"
+
+
+def _create_user_indexes(db):
+    from services.user_service import create_indexes
+    if not create_indexes():
+        raise RuntimeError("Could not create user indexes")
+
+
+def _backfill_user_search(db):
+    from services.user_service import reindex_users
+    reindex_users()
+
+
+def _create_print_claim_index(db):
+    from services.print_queue import create_indexes
+    create_indexes()
+
+
+def _rebuild_user_search(db):
+    from services.user_service import reindex_users
+    reindex_users(rebuild=True)
+
+
+def _create_session_indexes(db):
+    from models.session_model import UserSession
+    UserSession.create_indexes()
+
+
+def _create_response_cache_indexes(db):
+    from services.response_cache import MongoCacheBackend
+    MongoCacheBackend().create_indexes()
+
+
+def _create_users_created_at_index(db):
+    # get_all_users sorts on created_at; without this the sort runs in memory
+    db['users'].create_index([("created_at", -1)])
+
+
+def _rebuild_user_stats(db):
+    from services.user_stats import rebuild_counters
+    rebuild_counters()
+
+
+def _create_jobs_indexes(db):
+    from services.document_jobs import create_indexes
+    create_indexes()
+
+
+def _create_print_jobs_indexes(db):
+    from services.print_queue import create_indexes
+    create_indexes()
+
+
+def _create_file_storage_indexes(db):
+    from services.file_storage import create_indexes
+    create_indexes()
+
+
+def _create_dedup_indexes(db):
+    from services import blob_store, document_jobs
+    blob_store.create_indexes()
+    document_jobs.create_indexes()
+
+
+# Ordered list of (version, description, function). Append new entries; never
+# renumber or edit ones that have already shipped.
+MIGRATIONS = [
+    (1, "Create users indexes", _create_user_indexes),
+    (2, "Backfill user search fields", _backfill_user_search),
+    (3, "Create sessions indexes (unique session_id, TTL on expires_at)", _create_session_indexes),
+    (4, "Create response_cache TTL index", _create_response_cache_indexes),
+    (5, "Create users created_at index", _create_users_created_at_index),
+    (6, "Build user counters and daily signup stats", _rebuild_user_stats),
+    (7, "Create document jobs indexes (owner, queue order, TTL)", _create_jobs_indexes),
+    (8, "Create print_jobs indexes (claim order, leases, owner)", _create_print_jobs_indexes),
+    (9, "Create GridFS and upload session indexes", _create_file_storage_indexes),
+    (10, "Create blob store indexes and the document jobs content_key index", _create_dedup_indexes),
+    (11, "Rebuild user search fields without full-email prefixes", _rebuild_user_search),
+    (12, "Rebuild user search fields with Unicode word tokens", _rebuild_user_search),
+    (13, "Create print_jobs claim index for workers serving every printer", _create_print_claim_index),
+]
+
+
+def get_schema_version(db=None):
+    """Schema version recorded in the database (0 when never migrated)"""
+    db = db if db is not None else db_connection.get_db()
+    doc = db['meta'].find_one({"_id": SCHEMA_DOC_ID}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+def migrate(target=None):
+    """Apply every migration newer than the recorded schema version.
+
+    Each step records its version as soon as it succeeds, so a failed run
+    can simply be repeated. Returns the list of versions applied.
+    """
+    db = db_connection.get_db()
+    current = get_schema_version(db)
+    applied = []
+
+    for version, description, step in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+
+        print(f"🔄 Applying migration {version}: {description}")
+        step(db)
+        db['meta'].update_one(
+            {"_id": SCHEMA_DOC_ID},
+            {
+                "$set": {"version": version, "updated_at": datetime.utcnow()},
+                "$push": {"history": {
+                    "version": version,
+                    "description": description,
+                    "applied_at": datetime.utcnow()
+                }}
+            },
+            upsert=True
+        )
+        applied.append(version)
+        print(f"✅ Migration {version} applied")
+
+    if not applied:
+        print(f"✅ Schema is up to date (version {current})")
+    return applied
+
+
+def register_commands(app):
+    """Add ``flask migrate`` and ``flask schema-version`` to the app CLI"""
+    import click
+
+    @app.cli.command("migrate")
+    @click.option("--target", type=int, default=None, help="Stop at this schema version.")
+    def migrate_command(target):
+        """Create indexes and run data migrations."""
+        migrate(target)
+
+    @app.cli.command("schema-version")
+    def schema_version_command():
+        """Print the schema version recorded in MongoDB."""
+        latest = MIGRATIONS[-1][0]
+        click.echo(f"{get_schema_version()} (latest: {latest})")
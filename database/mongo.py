@@ -1,13 +1,21 @@
 # database/mongo.py
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import logging
 import os
 from dotenv import load_dotenv
 from flask import g
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class MongoDBConnection:
+    """Process-wide MongoDB client, created lazily and re-created after fork.
+
+    MongoClient is not fork-safe: its pool sockets and monitor threads must
+    not be shared with a child process. The client remembers the PID that
+    created it, and a child (e.g. a pre-forked gunicorn worker under
+    ``--preload``) drops the inherited client and connects on first use.
+    """
     _instance = None
     
     def __new__(cls):
@@ -15,6 +23,7 @@ class MongoDBConnection:
             cls._instance = super(MongoDBConnection, cls).__new__(cls)
             cls._instance._client = None
             cls._instance._db = None
+            cls._instance._pid = None
             cls._instance._initialized = False
         return cls._instance
     
@@ -25,8 +34,17 @@ class MongoDBConnection:
 
     
     def connect(self):
-        """Connect to MongoDB Atlas"""
+        """Create the MongoDB Atlas client.
+
+        MongoClient connects in the background, so no round-trip happens
+        here; connection problems surface on the first real operation (or
+        via /debug/ping).
+        """
+        from pymongo import MongoClient
+        from pymongo.errors import ConnectionFailure
+
         try:
+            self._check_pid()
             if self._client is not None and self._db is not None:
                 return self._db
             
@@ -35,62 +53,97 @@ class MongoDBConnection:
             if not MONGO_URI:
                 raise ValueError("MONGO_URI environment variable is not set")
             
-            print(f"🔗 Connecting to MongoDB Atlas...")
+            logger.info("Connecting to MongoDB Atlas")
             
+            from database.monitoring import event_listeners
+
             # Connection options for MongoDB Atlas
             self._client = MongoClient(
                 MONGO_URI,
-                maxPoolSize=50,
-                connectTimeoutMS=30000,
-                socketTimeoutMS=30000,
+                maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+                minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+                waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None,
+                connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "30000")),
+                socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
                 retryWrites=True,
                 retryReads=True,
-                serverSelectionTimeoutMS=5000
+                serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+                event_listeners=event_listeners()
             )
             
-            # Test the connection
-            self._client.admin.command('ping')
-            
             DB_NAME = os.getenv("DB_NAME", "dastawez")
             self._db = self._client[DB_NAME]
+            self._pid = os.getpid()
             
-            print(f"✅ MongoDB Atlas connected successfully! Database: {DB_NAME}")
+            logger.info("MongoDB Atlas client ready, database: %s (pid %d)", DB_NAME, self._pid)
             return self._db
             
         except ConnectionFailure as e:
-            print(f"❌ MongoDB connection failed: {e}")
+            logger.error("MongoDB connection failed: %s", e)
             raise
         except Exception as e:
-            print(f"❌ Error connecting to MongoDB: {e}")
+            logger.error("Error connecting to MongoDB: %s", e)
             raise
     
+    def _check_pid(self):
+        if self._client is not None and self._pid != os.getpid():
+            self.reset_after_fork()
+
+    def reset_after_fork(self):
+        """Forget a client inherited from the parent process.
+
+        The parent's client is not closed here: closing it from the child
+        would end sessions and sockets the parent may still be using.
+        """
+        if self._client is not None:
+            logger.info("Discarding MongoDB client inherited from pid %s", self._pid)
+        self._client = None
+        self._db = None
+        self._pid = None
+
     def get_db(self):
         """Get database instance"""
+        self._check_pid()
         if self._client is None or self._db is None:
             return self.connect()
         return self._db
     
     def get_client(self):
         """Get MongoDB client"""
+        self._check_pid()
         if self._client is None:
             self.connect()
         return self._client
     
+    def use_client(self, client, db_name=None):
+        """Use an already created client (benchmarks, in-memory stand-ins)"""
+        self._client = client
+        self._db = client[db_name or os.getenv("DB_NAME", "dastawez")]
+        self._pid = os.getpid()
+        return self._db
+    
     def close(self):
         """Close the connection"""
         if self._client is not None:
             self._client.close()
             self._client = None
             self._db = None
-            print("📴 MongoDB connection closed")
+            self._pid = None
+            logger.info("MongoDB connection closed")
     
     @property
     def client(self):
+        self._check_pid()
         return self._client
     
     @property
     def db(self):
+        self._check_pid()
         return self._db
 
 # Create singleton instance
-db_connection = MongoDBConnection()
\ No newline at end of file
+db_connection = MongoDBConnection()
+
+# Reset eagerly in forked children as well, before any thread can touch it
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=db_connection.reset_after_fork)
\ No newline at end of file
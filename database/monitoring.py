@@ -0,0 +1,158 @@
+# database/monitoring.py
+import threading
+import time
+
+from pymongo import monitoring
+
+from services.metrics import registry
+from services.request_metrics import record_mongo_command
+
+COMMAND_LATENCY = registry.histogram(
+    "mongodb_command_duration_seconds",
+    "Latency of MongoDB commands by command name.",
+    labelnames=("command",)
+)
+COMMAND_FAILURES = registry.counter(
+    "mongodb_command_failures_total",
+    "Failed MongoDB commands by command name and error code.",
+    labelnames=("command", "code")
+)
+CHECKOUT_WAIT = registry.histogram(
+    "mongodb_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+    labelnames=("address",)
+)
+CHECKOUT_FAILURES = registry.counter(
+    "mongodb_pool_checkout_failures_total",
+    "Failed pool checkouts by reason (timeout, pool closed, connection error).",
+    labelnames=("address", "reason")
+)
+POOL_SIZE = registry.gauge(
+    "mongodb_pool_connections",
+    "Open connections in the pool (idle and in use).",
+    labelnames=("address",)
+)
+POOL_IN_USE = registry.gauge(
+    "mongodb_pool_connections_in_use",
+    "Connections currently checked out of the pool.",
+    labelnames=("address",)
+)
+POOL_CLEARED = registry.counter(
+    "mongodb_pool_cleared_total",
+    "Times a pool was cleared after a network or server error.",
+    labelnames=("address",)
+)
+
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Records per-command latency and failures, and attributes each command
+    to the request being served"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        seconds = event.duration_micros / 1e6
+        COMMAND_LATENCY.observe(seconds, command=event.command_name)
+        record_mongo_command(event.command_name, seconds)
+
+    def failed(self, event):
+        seconds = event.duration_micros / 1e6
+        COMMAND_LATENCY.observe(seconds, command=event.command_name)
+        record_mongo_command(event.command_name, seconds)
+        code = (event.failure or {}).get("code", "")
+        COMMAND_FAILURES.inc(command=event.command_name, code=code)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Records pool size, in-use connections and checkout wait times"""
+
+    def __init__(self):
+        # Checkout start and end events fire on the thread doing the checkout
+        self._local = threading.local()
+
+    def _checkout_starts(self):
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = {}
+        return starts
+
+    def pool_created(self, event):
+        POOL_SIZE.set(0, address=_address(event))
+        POOL_IN_USE.set(0, address=_address(event))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.inc(address=_address(event))
+
+    def pool_closed(self, event):
+        # Each pooled connection reports its own connection_closed event
+        pass
+
+    def connection_created(self, event):
+        POOL_SIZE.inc(address=_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        POOL_SIZE.dec(address=_address(event))
+
+    def connection_check_out_started(self, event):
+        self._checkout_starts()[event.address] = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        address = _address(event)
+        started = self._checkout_starts().pop(event.address, None)
+        if started is not None:
+            CHECKOUT_WAIT.observe(time.perf_counter() - started, address=address)
+        CHECKOUT_FAILURES.inc(address=address, reason=event.reason)
+
+    def connection_checked_out(self, event):
+        address = _address(event)
+        started = self._checkout_starts().pop(event.address, None)
+        if started is not None:
+            CHECKOUT_WAIT.observe(time.perf_counter() - started, address=address)
+        POOL_IN_USE.inc(address=address)
+
+    def connection_checked_in(self, event):
+        POOL_IN_USE.dec(address=_address(event))
+
+
+class QueryShapeListener(monitoring.CommandListener):
+    """Feeds the filters of reads and writes into the query-plan auditor"""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def started(self, event):
+        from database.query_audit import AUDITED_COMMANDS
+
+        if event.command_name in AUDITED_COMMANDS:
+            try:
+                self.recorder.record(event.command_name, event.command, event.database_name)
+            except Exception:
+                pass
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def event_listeners():
+    """Listeners to pass to MongoClient(event_listeners=...)"""
+    listeners = [CommandMetricsListener(), PoolMetricsListener()]
+
+    from database import query_audit
+    if query_audit.enabled():
+        listeners.append(QueryShapeListener(query_audit.start_recording()))
+    return listeners
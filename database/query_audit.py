@@ -0,0 +1,337 @@
+# database/query_audit.py
+"""Query-plan auditing for development and CI.
+
+With ``QUERY_AUDIT=1`` every query issued through the client is reduced to
+its shape (collection, command, filter fields and operators, sort) and one
+sample per shape is kept. ``flask audit-queries`` runs ``explain()`` on each
+sample, reports collection scans, in-memory sorts and examined-to-returned
+ratios, proposes an index following the equality-sort-range rule, and
+exits non-zero when a shape is unindexed and not listed in the baseline.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+BASELINE_PATH = "query_audit_baseline.json"
+
+AUDITED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# Driver/session fields that must not be sent back inside ``explain``
+_SESSION_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction"}
+
+_EQUALITY_OPS = {"$eq", "$in", "$all"}
+
+
+def enabled():
+    return os.getenv("QUERY_AUDIT", "0") == "1"
+
+
+def _field_kind(value):
+    """Classify a filter value as eq, range or regex"""
+    if isinstance(value, dict) and value and all(k.startswith("$") for k in value):
+        ops = set(value)
+        if "$regex" in ops:
+            return "regex"
+        if ops <= _EQUALITY_OPS:
+            return "eq"
+        return "range"
+    if hasattr(value, "pattern") and hasattr(value, "flags"):
+        return "regex"
+    return "eq"
+
+
+def filter_shape(query, prefix=""):
+    """``{field: kind}`` for a filter, flattening $and/$or/$nor branches"""
+    shape = {}
+    for key, value in (query or {}).items():
+        if key in ("$and", "$or", "$nor"):
+            for branch in value:
+                for field, kind in filter_shape(branch, prefix).items():
+                    shape.setdefault(field, kind if key == "$and" else f"{key[1:]}:{kind}")
+        elif key.startswith("$"):
+            shape[key] = "expr"
+        else:
+            shape[prefix + key] = _field_kind(value)
+    return shape
+
+
+def _pipeline_query(pipeline):
+    """Filter and sort of the leading $match/$sort stages, the part an index can serve"""
+    query, sort = {}, {}
+    for stage in pipeline:
+        if "$match" in stage and not sort:
+            query = {"$and": [query, stage["$match"]]} if query else stage["$match"]
+        elif "$sort" in stage and not sort:
+            sort = stage["$sort"]
+        else:
+            break
+    return query, sort
+
+
+def describe(command_name, command):
+    """``(collection, query, sort, sample)`` for each statement of an audited command"""
+    collection = command.get(command_name)
+    if not isinstance(collection, str) or collection.startswith("system."):
+        return []
+
+    sample = {k: v for k, v in command.items() if not k.startswith("$") and k not in _SESSION_FIELDS}
+    if command_name == "find":
+        return [(collection, command.get("filter"), command.get("sort"), sample)]
+    if command_name == "aggregate":
+        query, sort = _pipeline_query(command.get("pipeline", []))
+        return [(collection, query, sort, sample)]
+    if command_name in ("count", "distinct", "findAndModify"):
+        return [(collection, command.get("query"), command.get("sort"), sample)]
+
+    statements_field = "updates" if command_name == "update" else "deletes"
+    statements = []
+    for statement in command.get(statements_field, []):
+        statements.append((collection, statement.get("q"), None, dict(sample, **{statements_field: [statement]})))
+    return statements
+
+
+def shape_key(collection, command_name, query, sort):
+    shape = json.dumps(filter_shape(query), sort_keys=True)
+    order = json.dumps(list((sort or {}).items()))
+    return f"{collection}.{command_name} filter={shape} sort={order}"
+
+
+class QueryShapeRecorder:
+    """One sample command per distinct query shape"""
+
+    def __init__(self):
+        self._shapes = {}
+        self._lock = threading.Lock()
+
+    def record(self, command_name, command, database):
+        for collection, query, sort, sample in describe(command_name, command):
+            key = shape_key(collection, command_name, query, sort)
+            with self._lock:
+                if key not in self._shapes:
+                    self._shapes[key] = {
+                        "key": key,
+                        "database": database,
+                        "collection": collection,
+                        "command": command_name,
+                        "filter": filter_shape(query),
+                        "sort": list((sort or {}).items()),
+                        "sample": sample
+                    }
+
+    def shapes(self):
+        with self._lock:
+            return list(self._shapes.values())
+
+    def load(self, path):
+        from bson import json_util
+
+        try:
+            with open(path) as f:
+                shapes = json_util.loads(f.read())
+        except FileNotFoundError:
+            return
+        with self._lock:
+            for shape in shapes:
+                self._shapes.setdefault(shape["key"], shape)
+
+    def save(self, path):
+        from bson import json_util
+
+        self.load(path)
+        with open(path, "w") as f:
+            f.write(json_util.dumps(self.shapes(), indent=2))
+
+
+recorder = QueryShapeRecorder()
+_save_registered = False
+
+
+def shapes_file():
+    return os.getenv("QUERY_AUDIT_FILE", ".query-shapes.json")
+
+
+def start_recording():
+    """Recorder for the client's QueryShapeListener; shapes are saved to
+    QUERY_AUDIT_FILE at exit (registered once, however often clients reconnect)"""
+    global _save_registered
+    if not _save_registered:
+        _save_registered = True
+        atexit.register(recorder.save, shapes_file())
+    return recorder
+
+
+def _plan_stages(plan):
+    """Stage names of a (classic or SBE) winning plan, outermost first"""
+    stages = []
+    while plan:
+        plan = plan.get("queryPlan", plan)
+        stages.append(plan.get("stage"))
+        children = plan.get("inputStages") or ([plan["inputStage"]] if "inputStage" in plan else [])
+        for child in children[1:]:
+            stages.extend(_plan_stages(child))
+        plan = children[0] if children else None
+    return [stage for stage in stages if stage]
+
+
+def _explain_sections(explain):
+    """queryPlanner and executionStats of a find/count or aggregate explain"""
+    if "queryPlanner" in explain:
+        return explain["queryPlanner"], explain.get("executionStats", {})
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor")
+        if cursor:
+            return cursor.get("queryPlanner", {}), cursor.get("executionStats", {})
+    return {}, {}
+
+
+def propose_index(shape):
+    """Equality fields, then sort fields, then range fields (ESR)"""
+    keys = []
+    seen = set()
+
+    def add(field, direction=1):
+        if field not in seen and not field.startswith("$"):
+            seen.add(field)
+            keys.append((field, direction))
+
+    for field, kind in shape["filter"].items():
+        if kind == "eq":
+            add(field)
+    for field, direction in shape["sort"]:
+        add(field, direction)
+    for field, kind in shape["filter"].items():
+        if kind in ("range", "regex"):
+            add(field)
+    return keys
+
+
+def explain_shape(db, shape):
+    """Plan summary for one recorded shape"""
+    explain = db.command({"explain": shape["sample"], "verbosity": "executionStats"})
+    planner, stats = _explain_sections(explain)
+    stages = _plan_stages(planner.get("winningPlan", {}))
+    returned = stats.get("nReturned", 0)
+    examined = max(stats.get("totalDocsExamined", 0), stats.get("totalKeysExamined", 0))
+    report = {
+        "key": shape["key"],
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "docs_examined": stats.get("totalDocsExamined", 0),
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "returned": returned,
+        "ratio": round(examined / max(returned, 1), 2),
+    }
+    report["unindexed"] = report["collscan"] or report["in_memory_sort"]
+    report["proposed_index"] = propose_index(shape) if report["unindexed"] else None
+    return report
+
+
+def audit(db, shapes, baseline=(), max_ratio=None):
+    """Explain every shape; returns ``(reports, failures)``.
+
+    A shape that cannot be explained is a failure too (with its ``error``),
+    unless it is baselined.
+    """
+    reports, failures = [], []
+    for shape in shapes:
+        try:
+            report = explain_shape(db.client[shape["database"]], shape)
+        except Exception as e:
+            logger.warning("explain failed for %s: %s", shape["key"], e)
+            report = {"key": shape["key"], "error": str(e), "unindexed": False, "proposed_index": None}
+        report["baselined"] = shape["key"] in baseline
+        too_many_examined = max_ratio is not None and report.get("ratio", 0) > max_ratio
+        if (report.get("error") or report["unindexed"] or too_many_examined) and not report["baselined"]:
+            failures.append(report)
+        reports.append(report)
+    return reports, failures
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f).get("accepted", {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, reports):
+    accepted = {
+        r["key"]: {"proposed_index": r["proposed_index"], "ratio": r.get("ratio")}
+        for r in reports if r["unindexed"] or r.get("error")
+    }
+    with open(path, "w") as f:
+        json.dump({"accepted": accepted}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def exercise_data_layer():
+    """Issue the data layer's read queries once so their shapes get recorded"""
+    from services import print_queue, user_service
+    from models.session_model import UserSession
+
+    user_service.user_cache.clear()
+    user_service.get_user_by_email("query-audit@example.com")
+    user_service.get_user_by_id("000000000000000000000000")
+    user_service.get_all_users()
+    user_service.get_users_page(limit=10)
+    user_service.search_users("audit", limit=10)
+    user_service.count_users()
+    UserSession.get_by_id("query-audit")
+    # Same filter and sort as print-worker claims, without leasing anything
+    print_queue.next_claimable()
+    print_queue.next_claimable(printer=print_queue.DEFAULT_PRINTER)
+
+
+def register_commands(app):
+    """Add ``flask audit-queries`` to the app CLI"""
+    import click
+
+    @app.cli.command("audit-queries")
+    @click.option("--shapes", "shapes_path", default=None, help="Recorded shapes file (default: QUERY_AUDIT_FILE).")
+    @click.option("--baseline", "baseline_path", default=BASELINE_PATH, show_default=True)
+    @click.option("--exercise/--no-exercise", default=True, help="Run the data layer's queries first.")
+    @click.option("--max-ratio", type=float, default=None, help="Also fail above this examined/returned ratio.")
+    @click.option("--update-baseline", is_flag=True, help="Accept every current finding.")
+    def audit_queries_command(shapes_path, baseline_path, exercise, max_ratio, update_baseline):
+        """Explain recorded query shapes and fail on new unindexed ones."""
+        from database.mongo import db_connection
+
+        if exercise:
+            # Reconnect so the client carries the recording listener
+            os.environ["QUERY_AUDIT"] = "1"
+            db_connection.close()
+            exercise_data_layer()
+        recorder.load(shapes_path or shapes_file())
+
+        db = db_connection.get_db()
+        baseline = load_baseline(baseline_path)
+        reports, failures = audit(db, recorder.shapes(), baseline, max_ratio)
+
+        for report in reports:
+            if report.get("error"):
+                click.echo(f"{'⚠️ ' if report['baselined'] else '❌'} {report['key']}")
+                click.echo(f"    explain failed: {report['error']}")
+                continue
+            status = "✅"
+            if report["unindexed"]:
+                status = "⚠️ " if report["baselined"] else "❌"
+            click.echo(f"{status} {report['key']}")
+            click.echo(f"    plan={'>'.join(report['stages'])} examined={report['docs_examined']} "
+                       f"keys={report['keys_examined']} returned={report['returned']} ratio={report['ratio']}")
+            if report["proposed_index"]:
+                click.echo(f"    proposed index: {report['proposed_index']}")
+
+        if update_baseline:
+            save_baseline(baseline_path, reports)
+            click.echo(f"✅ Baseline written to {baseline_path}")
+            return
+        if failures:
+            click.echo(f"❌ {len(failures)} query shape(s) need an index or failed to explain (or need a baseline entry)")
+            raise SystemExit(1)
+        click.echo(f"✅ {len(reports)} query shapes audited")
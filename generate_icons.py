@@ -1,22 +1,173 @@
-# use_existing_logo.py
+# generate_icons.py
+"""Render correctly sized icon variants of the logo and update the PWA manifest.
+
+Each (source, size, format) rendition is produced in parallel across a
+process pool. Renditions whose source image and settings are unchanged since
+the last run are skipped, so repeated runs only redo what changed. Needs
+Pillow (and Pillow's AVIF support or the pillow-avif-plugin for .avif):
+
+    pip install -r requirements-dev.txt
+    python generate_icons.py [--force] [--workers N]
+"""
+import argparse
+import hashlib
+import json
 import os
-import shutil
-
-# Create icons directory
-os.makedirs('static/img/icons', exist_ok=True)
-
-# Copy your existing logo to all icon sizes
-logo_path = 'static/img/logo.png'
-
-if os.path.exists(logo_path):
-    sizes = [72, 96, 128, 144, 152, 192, 384, 512]
-    
-    for size in sizes:
-        # Just copy the same file with different names
-        shutil.copy(logo_path, f'static/img/icons/icon-{size}x{size}.jpg')
-        print(f"✅ Copied: icon-{size}x{size}.jpg")
-    
-    print("🎉 All icons created (using existing JPG)")
-else:
-    print("❌ Logo not found at:", logo_path)
-    print("💡 Please check if static/img/logo.jpg exists")
\ No newline at end of file
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+MANIFEST_PATH = 'static/manifest.json'
+STATE_PATH = 'static/img/icons/.renditions.json'
+
+# Source image -> sizes and output pattern for its renditions
+SOURCES = [
+    {
+        'source': 'static/img/logo.png',
+        'sizes': [72, 96, 128, 144, 152, 192, 384, 512],
+        'output': 'static/img/icons/icon-{size}x{size}.{ext}',
+        'manifest': True
+    },
+]
+
+FORMATS = {
+    'png': {'ext': 'png', 'mime': 'image/png', 'save': {'format': 'PNG', 'optimize': True}},
+    'webp': {'ext': 'webp', 'mime': 'image/webp', 'save': {'format': 'WEBP', 'quality': 90, 'method': 6}},
+    'avif': {'ext': 'avif', 'mime': 'image/avif', 'save': {'format': 'AVIF', 'quality': 70}},
+}
+
+
+def available_formats():
+    """Formats this Pillow build can write"""
+    from PIL import features
+
+    formats = ['png']
+    if features.check('webp'):
+        formats.append('webp')
+    try:
+        import pillow_avif  # noqa: F401 - registers the AVIF plugin
+    except ImportError:
+        pass
+    from PIL import Image
+    Image.init()
+    if 'AVIF' in Image.SAVE:
+        formats.append('avif')
+    return formats
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render(source, size, fmt, output):
+    """Resize ``source`` onto a transparent ``size`` square and save it (runs in a worker)"""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image = image.convert('RGBA')
+        image.thumbnail((size, size), Image.LANCZOS)
+        canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        canvas.paste(image, ((size - image.width) // 2, (size - image.height) // 2), image)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    tmp = output + '.tmp'
+    canvas.save(tmp, **FORMATS[fmt]['save'])
+    os.replace(tmp, output)
+    return output, os.path.getsize(output)
+
+
+def load_state():
+    try:
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    with open(STATE_PATH, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def update_manifest(icons):
+    with open(MANIFEST_PATH) as f:
+        manifest = json.load(f)
+    manifest['icons'] = icons
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--force', action='store_true', help='Re-render everything')
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size (default: CPU count)')
+    args = parser.parse_args()
+
+    try:
+        formats = available_formats()
+    except ImportError:
+        print("❌ Pillow is not installed")
+        print("💡 pip install -r requirements-dev.txt")
+        return 1
+
+    state = {} if args.force else load_state()
+    new_state = {}
+    jobs = []
+    manifest_icons = []
+
+    for spec in SOURCES:
+        source = spec['source']
+        if not os.path.exists(source):
+            print("❌ Source image not found at:", source)
+            continue
+        source_hash = file_digest(source)
+
+        for size in spec['sizes']:
+            for fmt in formats:
+                output = spec['output'].format(size=size, ext=FORMATS[fmt]['ext'])
+                key = f"{source_hash}:{size}:{fmt}:{json.dumps(FORMATS[fmt]['save'], sort_keys=True)}"
+                new_state[output] = key
+                if state.get(output) != key or not os.path.exists(output):
+                    jobs.append((source, size, fmt, output))
+
+                if spec.get('manifest') and fmt in ('png', 'webp'):
+                    manifest_icons.append((output, {
+                        'src': '/' + output,
+                        'sizes': f'{size}x{size}',
+                        'type': FORMATS[fmt]['mime'],
+                        'purpose': 'any'
+                    }))
+
+    skipped = len(new_state) - len(jobs)
+    failed = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(render, *job): job for job in jobs}
+            for future in as_completed(futures):
+                output = futures[future][3]
+                try:
+                    _, size_bytes = future.result()
+                    print(f"✅ Rendered: {output} ({size_bytes} bytes)")
+                except Exception as e:
+                    failed += 1
+                    new_state.pop(output, None)
+                    print(f"❌ Failed: {output}: {e}")
+
+    save_state(new_state)
+    if failed:
+        print("⚠️  manifest.json left unchanged because some icons failed to render")
+    else:
+        # Only icons that are actually on disk (a source may have been missing)
+        icons = [icon for output, icon in manifest_icons if os.path.exists(output)]
+        if icons:
+            update_manifest(icons)
+    print(f"🎉 {len(jobs) - failed} rendered, {skipped} unchanged, {failed} failed ({', '.join(formats)})")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
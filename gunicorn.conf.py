@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+"""Production launcher settings: ``gunicorn -c gunicorn.conf.py app:app``
+
+One worker process per core, each serving requests on a thread pool
+(gthread), so CPU-bound work such as template rendering uses every core
+while requests waiting on MongoDB overlap within a worker. The app is
+loaded once in the master (``preload_app``) and forked; every worker then
+opens its own MongoClient with an even share of
+``MONGO_CONNECTION_BUDGET`` connections.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:" + os.getenv("PORT", "8000"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound slow leaks; jitter avoids restarting all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# Total MongoDB connections the deployment may open from one node
+MONGO_CONNECTION_BUDGET = int(os.getenv("MONGO_CONNECTION_BUDGET", "200"))
+
+
+def pool_size_per_worker(workers, threads, budget=MONGO_CONNECTION_BUDGET):
+    """An even share of the budget, but never fewer than the request threads need"""
+    return max(threads + 2, budget // max(workers, 1))
+
+
+def post_fork(server, worker):
+    from database.mongo import db_connection
+
+    os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(pool_size_per_worker(workers, threads)))
+    # The fork hook already did this; repeated here so the worker never reuses the master's client
+    db_connection.reset_after_fork()
+    server.log.info("Worker %s ready (MongoDB pool size %s)", worker.pid, os.environ["MONGO_MAX_POOL_SIZE"])
@@ -9,52 +9,82 @@ def get_sessions_collection():
     return db['sessions']
 
 class UserSession:
-    def __init__(self, user_email, session_id=None, created_at=None, expires_at=None):
+    def __init__(self, user_email, session_id=None, created_at=None, expires_at=None, data=None, last_seen=None):
         self.session_id = session_id or secrets.token_urlsafe(32)
         self.user_email = user_email
         self.created_at = created_at or datetime.utcnow()
         self.expires_at = expires_at or (datetime.utcnow() + timedelta(days=30))
-    
+        self.data = data or {}
+        self.last_seen = last_seen or self.created_at
+
     def to_dict(self):
         return {
             'session_id': self.session_id,
             'user_email': self.user_email,
             'created_at': self.created_at,
             'expires_at': self.expires_at,
+            'last_seen': self.last_seen,
+            'data': self.data,
             'user_agent': request.headers.get('User-Agent', ''),
             'ip_address': request.remote_addr
         }
-    
+
     def save(self):
         sessions_collection = get_sessions_collection()
+        doc = self.to_dict()
+        created_at = doc.pop('created_at')
         sessions_collection.update_one(
             {'session_id': self.session_id},
-            {'$set': self.to_dict()},
+            {'$set': doc, '$setOnInsert': {'created_at': created_at}},
             upsert=True
         )
-    
+
+    def touch(self, last_seen, expires_at):
+        """Record activity and extend expiry without rewriting the session data"""
+        sessions_collection = get_sessions_collection()
+        sessions_collection.update_one(
+            {'session_id': self.session_id},
+            {'$set': {'last_seen': last_seen, 'expires_at': expires_at}}
+        )
+        self.last_seen = last_seen
+        self.expires_at = expires_at
+
     @staticmethod
     def get_by_id(session_id):
         sessions_collection = get_sessions_collection()
-        data = sessions_collection.find_one({'session_id': session_id})
-        if data and data['expires_at'] > datetime.utcnow():
+        data = sessions_collection.find_one({
+            'session_id': session_id,
+            'expires_at': {'$gt': datetime.utcnow()}
+        })
+        if data:
             return UserSession(
                 session_id=data['session_id'],
-                user_email=data['user_email'],
+                user_email=data.get('user_email'),
                 created_at=data['created_at'],
-                expires_at=data['expires_at']
+                expires_at=data['expires_at'],
+                data=data.get('data'),
+                last_seen=data.get('last_seen')
             )
         return None
-    
+
     @staticmethod
     def delete(session_id):
         sessions_collection = get_sessions_collection()
         sessions_collection.delete_one({'session_id': session_id})
-    
+
     @staticmethod
     def delete_all_for_user(user_email):
         sessions_collection = get_sessions_collection()
         sessions_collection.delete_many({'user_email': user_email})
-    
+
+    @staticmethod
+    def create_indexes():
+        """Unique lookup by session_id, TTL expiry and per-user cleanup"""
+        sessions_collection = get_sessions_collection()
+        sessions_collection.create_index([('session_id', 1)], unique=True)
+        # MongoDB removes documents once expires_at has passed
+        sessions_collection.create_index([('expires_at', 1)], expireAfterSeconds=0)
+        sessions_collection.create_index([('user_email', 1)])
+
     def is_valid(self):
-        return self.expires_at > datetime.utcnow()
\ No newline at end of file
+        return self.expires_at > datetime.utcnow()
@@ -3,6 +3,18 @@ from datetime import datetime
 from bson import ObjectId
 
 class User:
+    __slots__ = (
+        "_id",
+        "google_id",
+        "name",
+        "email",
+        "picture",
+        "access_token",
+        "refresh_token",
+        "created_at",
+        "last_login"
+    )
+
     def __init__(
         self,
         google_id=None,
@@ -24,7 +36,7 @@ class User:
         self.refresh_token = refresh_token
         self.created_at = created_at or datetime.utcnow()
         self.last_login = last_login or datetime.utcnow()
-    
+
     def to_dict(self):
         """Convert User object to dictionary"""
         user_dict = {
@@ -37,31 +49,68 @@ class User:
             "created_at": self.created_at,
             "last_login": self.last_login
         }
-        
-        if hasattr(self, '_id') and self._id:
+
+        if self._id:
             user_dict['_id'] = self._id
-        
+
         return user_dict
-    
+
+    def to_public_dict(self):
+        """Dictionary for API responses: no OAuth tokens, string id"""
+        return {
+            "_id": self.id,
+            "google_id": self.google_id,
+            "name": self.name,
+            "email": self.email,
+            "picture": self.picture,
+            "created_at": self.created_at,
+            "last_login": self.last_login
+        }
+
     @classmethod
     def from_dict(cls, data):
-        """Create User object from dictionary"""
+        """Create User object from a stored document.
+
+        Fields missing from the document stay None; unlike the constructor
+        no ObjectId or timestamps are generated for them.
+        """
         if not data:
             return None
-        
-        return cls(
-            _id=data.get('_id'),
-            google_id=data.get('google_id'),
-            name=data.get('name'),
-            email=data.get('email'),
-            picture=data.get('picture'),
-            access_token=data.get('access_token'),
-            refresh_token=data.get('refresh_token'),
-            created_at=data.get('created_at'),
-            last_login=data.get('last_login')
-        )
-    
+
+        user = cls.__new__(cls)
+        for field in cls.__slots__:
+            setattr(user, field, data.get(field))
+        return user
+
+    @classmethod
+    def from_raw(cls, raw):
+        """Wrap a RawBSONDocument without decoding it (see LazyUser)"""
+        if raw is None:
+            return None
+        return LazyUser(raw)
+
     @property
     def id(self):
         """Get string representation of ObjectId"""
-        return str(self._id) if self._id else None
\ No newline at end of file
+        return str(self._id) if self._id else None
+
+
+class LazyUser(User):
+    """User backed by a pymongo RawBSONDocument.
+
+    The BSON bytes are decoded the first time any field is read and each
+    field is then cached in its slot, so rows that are never looked at (or
+    only partly looked at) cost no dict or value allocations.
+    """
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        # Only reached when the slot has not been filled yet
+        if name in User.__slots__:
+            value = self._raw.get(name)
+            setattr(self, name, value)
+            return value
+        raise AttributeError(name)
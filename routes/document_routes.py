@@ -0,0 +1,112 @@
+# routes/document_routes.py
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, request, session, stream_with_context, url_for
+
+from services import document_templates
+from services.document_jobs import engine, get_job
+
+document_routes = Blueprint("document_routes", __name__)
+
+# Seconds an /events stream stays open before the client has to reconnect
+EVENTS_TIMEOUT = 120
+EVENTS_POLL_INTERVAL = 0.5
+
+def _current_email():
+    user = session.get("user")
+    return user.get("email") if user else None
+
+def _job_urls(job_id):
+    return {
+        "status_url": url_for("document_routes.route_job_status", job_id=job_id),
+        "events_url": url_for("document_routes.route_job_events", job_id=job_id),
+        "download_url": url_for("document_routes.route_job_download", job_id=job_id)
+    }
+
+@document_routes.route("/documents/templates", methods=["GET"])
+def route_list_templates():
+    """Document templates, their required fields and the available formats"""
+    templates = [
+        {"id": template_id, "title": spec["title"], "fields": spec["fields"]}
+        for template_id, spec in document_templates.DOCUMENT_TEMPLATES.items()
+    ]
+    return jsonify({"templates": templates, "formats": document_templates.available_formats()}), 200
+
+@document_routes.route("/documents/jobs", methods=["POST"])
+def route_create_job():
+    """Queue a document for rendering; returns 202 with URLs to follow it"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    data = request.get_json(silent=True) or {}
+    try:
+        job_id = engine.submit(email, data.get("template_id"), data.get("format", "pdf"), data.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(dict(_job_urls(job_id), job_id=job_id, status="queued")), 202
+
+@document_routes.route("/documents/jobs/<job_id>", methods=["GET"])
+def route_job_status(job_id):
+    """Current status and progress of a job (for polling)"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    job = get_job(job_id, email)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(dict(job, **_job_urls(job["_id"]))), 200
+
+@document_routes.route("/documents/jobs/<job_id>/events", methods=["GET"])
+def route_job_events(job_id):
+    """Server-sent events with the job status whenever it changes"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+    if get_job(job_id, email) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    dumps = current_app.json.dumps
+
+    def generate():
+        last = None
+        deadline = time.monotonic() + EVENTS_TIMEOUT
+        while time.monotonic() < deadline:
+            job = get_job(job_id, email)
+            if job is None:
+                yield "event: error\ndata: {\"error\": \"Job not found\"}\n\n"
+                return
+            state = (job["status"], job.get("progress"))
+            if state != last:
+                yield f"event: status\ndata: {dumps(job)}\n\n"
+                last = state
+            else:
+                yield ": keep-alive\n\n"
+            if job["status"] in ("done", "failed"):
+                return
+            time.sleep(EVENTS_POLL_INTERVAL)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+@document_routes.route("/documents/jobs/<job_id>/download", methods=["GET"])
+def route_job_download(job_id):
+    """Rendered document of a finished job"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    job = get_job(job_id, email, include_result=True)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] != "done":
+        return jsonify({"error": f"Job is {job['status']}", "status": job["status"]}), 409
+
+    response = Response(bytes(job["result"]), mimetype=job["mimetype"])
+    response.headers["Content-Disposition"] = f"attachment; filename=\"{job['filename']}\""
+    response.cache_control.private = True
+    return response
@@ -0,0 +1,204 @@
+# routes/file_routes.py
+from urllib.parse import quote
+
+from flask import Blueprint, Response, jsonify, request, session
+from bson import ObjectId
+from werkzeug.http import dump_options_header
+
+from services import blob_store, file_storage
+from services.file_storage import UploadConflict, UploadError
+
+file_routes = Blueprint("file_routes", __name__)
+
+def _current_email():
+    user = session.get("user")
+    return user.get("email") if user else None
+
+def _object_id(value):
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+def _upload_filename():
+    return file_storage.clean_filename(request.headers.get("X-Filename") or request.args.get("filename"))
+
+def _content_disposition(filename):
+    """``inline`` header with a quoted ASCII fallback and an RFC 5987 UTF-8 name"""
+    options = {"filename": filename}
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        import unicodedata
+        fallback = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode()
+        options = {"filename": fallback or "download", "filename*": "UTF-8''" + quote(filename, safe="")}
+    return dump_options_header("inline", options)
+
+@file_routes.route("/files", methods=["POST"])
+def route_upload_file():
+    """Store the raw request body; it is streamed to GridFS chunk by chunk"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    try:
+        file_id, length = blob_store.upload_stream(
+            request.stream, _upload_filename(), request.mimetype or None, owner=email
+        )
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 413
+    return jsonify({"file_id": file_id, "length": length}), 201
+
+@file_routes.route("/files/uploads", methods=["POST"])
+def route_start_upload():
+    """Open a resumable upload; send the data with PATCH and Upload-Offset"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    data = request.get_json(silent=True) or {}
+    upload_id = file_storage.start_upload(
+        file_storage.clean_filename(data.get("filename")), data.get("content_type"), owner=email
+    )
+    return jsonify({
+        "upload_id": upload_id,
+        "offset": 0,
+        "chunk_size": file_storage.CHUNK_SIZE
+    }), 201
+
+@file_routes.route("/files/uploads/<upload_id>", methods=["HEAD"])
+def route_upload_offset(upload_id):
+    """Where to resume: the Upload-Offset header holds the bytes received so far"""
+    email = _current_email()
+    upload_oid = _object_id(upload_id)
+    upload = file_storage.get_upload(upload_oid, email) if email and upload_oid else None
+    if upload is None:
+        return Response(status=404)
+    return Response(status=200, headers={"Upload-Offset": str(upload["offset"]), "Cache-Control": "no-store"})
+
+@file_routes.route("/files/uploads/<upload_id>", methods=["PATCH"])
+def route_append_upload(upload_id):
+    """Append the request body at the Upload-Offset header's position"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    upload_oid = _object_id(upload_id)
+    offset = request.headers.get("Upload-Offset", type=int)
+    if upload_oid is None or offset is None:
+        return jsonify({"error": "A valid upload id and Upload-Offset header are required"}), 400
+
+    try:
+        new_offset = file_storage.append_upload(upload_oid, email, offset, request.stream)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 409
+    return Response(status=204, headers={"Upload-Offset": str(new_offset)})
+
+@file_routes.route("/files/uploads/<upload_id>/complete", methods=["POST"])
+def route_complete_upload(upload_id):
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    upload_oid = _object_id(upload_id)
+    try:
+        if upload_oid is None:
+            raise UploadError("Unknown or expired upload")
+        file_id = blob_store.complete_resumable(upload_oid, email)
+    except UploadConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 404
+    return jsonify({"file_id": file_id}), 201
+
+@file_routes.route("/files/<file_id>", methods=["GET"])
+def route_download_file(file_id):
+    """Stream a stored file, honouring Range and If-None-Match"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    file_oid = _object_id(file_id)
+    ref = blob_store.get_reference(file_oid, email) if file_oid else None
+    file_doc = blob_store.open_content(ref) if ref else None
+    if file_doc is None:
+        return jsonify({"error": "File not found"}), 404
+
+    # Content is addressed by its hash, which makes it a strong validator
+    etag = ref["sha256"]
+    length = file_doc["length"]
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Cache-Control": "private, max-age=31536000, immutable"
+    }
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    start, end, status = 0, length - 1, 200
+    byte_range = request.range
+    if byte_range is not None and byte_range.units == "bytes" and len(byte_range.ranges) == 1 \
+            and request.if_range.etag in (None, etag):
+        bounds = byte_range.range_for_length(length)
+        if bounds is None:
+            headers["Content-Range"] = f"bytes */{length}"
+            return Response(status=416, headers=headers)
+        start, end = bounds[0], bounds[1] - 1
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+    headers["Content-Disposition"] = _content_disposition(file_storage.clean_filename(ref["filename"]))
+    mimetype = ref.get("content_type") or "application/octet-stream"
+    return Response(
+        file_storage.iter_file(file_doc, start, end),
+        status=status,
+        mimetype=mimetype,
+        headers=headers,
+        direct_passthrough=True
+    )
+
+@file_routes.route("/files/<file_id>", methods=["DELETE"])
+def route_delete_file(file_id):
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    file_oid = _object_id(file_id)
+    if file_oid is None or not blob_store.remove_reference(file_oid, email):
+        return jsonify({"error": "File not found"}), 404
+    return jsonify({"message": "File deleted"}), 200
+
+@file_routes.route("/files/<file_id>/thumbnail", methods=["GET"])
+def route_file_thumbnail(file_id):
+    """JPEG thumbnail of an uploaded image, built once per distinct content"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    size = request.args.get("size", 256, type=int)
+    if size not in (128, 256, 512):
+        return jsonify({"error": "size must be 128, 256 or 512"}), 400
+
+    file_oid = _object_id(file_id)
+    ref = blob_store.get_reference(file_oid, email) if file_oid else None
+    if ref is None:
+        return jsonify({"error": "File not found"}), 404
+    if not (ref.get("content_type") or "").startswith("image/"):
+        return jsonify({"error": "Thumbnails are only available for images"}), 415
+
+    etag = f"{ref['sha256']}-{size}"
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+    try:
+        artifact = blob_store.thumbnail(ref, size)
+    except ImportError:
+        return jsonify({"error": "Thumbnails need Pillow"}), 501
+    except blob_store.UnsupportedImage:
+        return jsonify({"error": "File is not a supported image"}), 415
+
+    response = Response(
+        file_storage.iter_file(file_storage.get_file(artifact["file_id"])),
+        mimetype=artifact["content_type"],
+        direct_passthrough=True
+    )
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    return response
@@ -0,0 +1,70 @@
+# routes/print_routes.py
+from flask import Blueprint, jsonify, request, session
+from bson import ObjectId
+
+from services import print_queue
+from services.document_jobs import get_job as get_document_job
+
+print_routes = Blueprint("print_routes", __name__)
+
+def _current_email():
+    user = session.get("user")
+    return user.get("email") if user else None
+
+@print_routes.route("/print/jobs", methods=["POST"])
+def route_create_print_job():
+    """Queue a finished document job for printing"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    data = request.get_json(silent=True) or {}
+    document = get_document_job(str(data.get("document_job_id", "")), email)
+    if document is None:
+        return jsonify({"error": "Document not found"}), 404
+    if document["status"] != "done":
+        return jsonify({"error": "Document is not ready yet"}), 409
+
+    try:
+        job_id = print_queue.submit(
+            email,
+            document["_id"],
+            printer=data.get("printer"),
+            copies=int(data.get("copies", 1)),
+            pages=int(data.get("pages", 1)),
+            color=bool(data.get("color", False)),
+            priority=data.get("priority", "normal")
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@print_routes.route("/print/jobs", methods=["GET"])
+def route_list_print_jobs():
+    """The current user's most recent print jobs"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+    return jsonify({"jobs": print_queue.list_jobs(email)}), 200
+
+@print_routes.route("/print/jobs/<job_id>", methods=["GET"])
+def route_get_print_job(job_id):
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    job = print_queue.get_job(ObjectId(job_id), email) if ObjectId.is_valid(job_id) else None
+    if job is None:
+        return jsonify({"error": "Print job not found"}), 404
+    return jsonify(job), 200
+
+@print_routes.route("/print/jobs/<job_id>", methods=["DELETE"])
+def route_cancel_print_job(job_id):
+    """Cancel a print job that no worker has claimed yet"""
+    email = _current_email()
+    if not email:
+        return jsonify({"error": "Login required"}), 401
+
+    if not ObjectId.is_valid(job_id) or not print_queue.cancel(ObjectId(job_id), email):
+        return jsonify({"error": "Print job not found or already printing"}), 409
+    return jsonify({"message": "Print job cancelled"}), 200
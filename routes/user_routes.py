@@ -1,19 +1,72 @@
 # routes/user_routes.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from services.user_service import (
     save_user_data,
+    bulk_save_users,
     get_user_by_email,
     get_user_by_id,
-    get_all_users,
+    get_users_page,
+    iter_users,
     delete_user,
     update_user,
-    count_users
+    count_users,
+    search_users
 )
-from models.user_model import User
+from services.user_search import decode_cursor
 from bson import ObjectId
 
 user_routes = Blueprint("user_routes", __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+MAX_BULK_USERS = 10000
+
+def parse_listing_args(args):
+    """Read limit/after/fields query parameters, raising ValueError when invalid"""
+    limit = args.get("limit", type=int)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    after = args.get("after")
+    if after and not ObjectId.is_valid(after):
+        raise ValueError("after must be a user id returned as 'next'")
+
+    fields = args.get("fields")
+    fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return limit, after, fields
+
+def parse_search_args(args):
+    """Read limit/after/fields for /users/search, raising ValueError when invalid"""
+    limit = args.get("limit", 20, type=int)
+    if not 1 <= limit <= 100:
+        raise ValueError("limit must be between 1 and 100")
+
+    after = args.get("after")
+    if after:
+        _, user_id = decode_cursor(after)
+        if not ObjectId.is_valid(user_id):
+            raise ValueError("after must be a cursor returned as 'next'")
+
+    fields = args.get("fields")
+    fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return limit, after, fields
+
+def stream_users_response(after=None, fields=None, limit=None, include_id=True):
+    """Stream users as a JSON array, one element per cursor document"""
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield "["
+        first = True
+        for user_data in iter_users(after=after, fields=fields, limit=limit):
+            if not include_id:
+                user_data.pop("_id", None)
+            yield ("" if first else ",") + dumps(user_data)
+            first = False
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
 @user_routes.route("/users", methods=["POST"])
 def route_create_user():
     """Create a new user"""
@@ -28,13 +81,49 @@ def route_create_user():
     else:
         return jsonify({"error": "Failed to create user"}), 500
 
+@user_routes.route("/users/bulk", methods=["POST"])
+def route_bulk_create_users():
+    """Create or update many users in one request"""
+    data = request.get_json(silent=True)
+    records = data.get("users") if isinstance(data, dict) else data
+
+    if not isinstance(records, list) or not records:
+        return jsonify({"error": "A non-empty list of users is required"}), 400
+    if len(records) > MAX_BULK_USERS:
+        return jsonify({"error": f"At most {MAX_BULK_USERS} users per request"}), 413
+
+    results = bulk_save_users(records)
+    summary = {"inserted": 0, "updated": 0, "error": 0}
+    for result in results:
+        summary[result["status"]] += 1
+
+    return jsonify({
+        "inserted": summary["inserted"],
+        "updated": summary["updated"],
+        "failed": summary["error"],
+        "results": results
+    }), 200
+
 @user_routes.route("/users", methods=["GET"])
 def route_get_all_users():
-    """Get all users"""
-    users = get_all_users()
-    # Convert User objects to dictionaries
-    users_list = [user.to_dict() for user in users]
-    return jsonify(users_list), 200
+    """List users.
+
+    With ``limit``/``after`` a single page is returned together with the
+    cursor for the next one; otherwise (or with ``stream=1``) every user is
+    streamed as a JSON array straight from the cursor.
+    """
+    try:
+        limit, after, fields = parse_listing_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.args.get("stream") == "1" or (limit is None and after is None):
+        return stream_users_response(after=after, fields=fields, limit=limit)
+
+    users_data, next_cursor = get_users_page(
+        limit=limit or DEFAULT_PAGE_SIZE, after=after, fields=fields
+    )
+    return jsonify({"users": users_data, "next": next_cursor}), 200
 
 @user_routes.route("/users/<identifier>", methods=["GET"])
 def route_get_user(identifier):
@@ -49,7 +138,7 @@ def route_get_user(identifier):
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    return jsonify(user.to_dict()), 200
+    return jsonify(user), 200
 
 @user_routes.route("/users/<email>", methods=["PUT"])
 def route_update_user(email):
@@ -83,28 +172,19 @@ def route_count_users():
 
 @user_routes.route("/users/search", methods=["GET"])
 def route_search_users():
-    """Search users by name or email"""
+    """Search users by name or email prefix, best matches first"""
     query = request.args.get('q', '')
     
     if not query:
         return jsonify({"error": "Search query is required"}), 400
-    
+
+    try:
+        limit, after, fields = parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
-        from database.mongo import db
-        users_collection = db['users']
-        
-        # Create search query (case-insensitive)
-        search_query = {
-            "$or": [
-                {"name": {"$regex": query, "$options": "i"}},
-                {"email": {"$regex": query, "$options": "i"}}
-            ]
-        }
-        
-        users_data = list(users_collection.find(search_query).limit(20))
-        users = [User.from_dict(user_data).to_dict() for user_data in users_data]
-        
-        return jsonify(users), 200
+        users_data, next_cursor, truncated = search_users(query, limit=limit, after=after, fields=fields)
+        return jsonify({"users": users_data, "next": next_cursor, "truncated": truncated}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
\ No newline at end of file
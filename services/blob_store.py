@@ -0,0 +1,235 @@
+# services/blob_store.py
+"""Content-addressed storage on top of services/file_storage.py.
+
+Every distinct content is one ``blobs`` document keyed by its SHA-256 and
+pointing at one GridFS file. What users see as files are ``file_refs``:
+name, type and owner plus the hash. A blob's ``refcount`` counts its refs;
+when a duplicate is uploaded the new GridFS copy is dropped and the count
+goes up, and when the last ref is removed the content and everything
+derived from it is deleted. Derived artifacts (thumbnails, print-ready
+files) are cached per content hash, kind and parameters, so they are built
+once however many users upload the same file.
+"""
+import hashlib
+import io
+import json
+import logging
+from datetime import datetime
+
+from database.mongo import db_connection
+from services import file_storage
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+UPLOADS = registry.counter(
+    "blob_uploads_total", "Uploads by outcome (new content or duplicate).", labelnames=("outcome",)
+)
+BYTES_DEDUPLICATED = registry.counter(
+    "blob_deduplicated_bytes_total", "Bytes not stored again because identical content existed."
+)
+DERIVED_REQUESTS = registry.counter(
+    "blob_derived_requests_total", "Derived artifact lookups by kind and result (hit, miss).",
+    labelnames=("kind", "result")
+)
+
+
+class UnsupportedImage(ValueError):
+    """Content labelled as an image that Pillow cannot (or will not) decode"""
+
+
+def get_blobs_collection():
+    return db_connection.get_db()['blobs']
+
+
+def get_file_refs_collection():
+    return db_connection.get_db()['file_refs']
+
+
+def get_derived_collection():
+    return db_connection.get_db()['derived_artifacts']
+
+
+def create_indexes():
+    get_file_refs_collection().create_index([("owner", 1), ("created_at", -1)])
+    get_file_refs_collection().create_index([("sha256", 1)])
+    get_derived_collection().create_index([("sha256", 1)])
+
+
+def _attach(sha256, file_id, length, content_type):
+    """Register stored content under its hash; returns the GridFS id of the kept copy"""
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    blobs = get_blobs_collection()
+    while True:
+        try:
+            blobs.insert_one({
+                "_id": sha256,
+                "file_id": file_id,
+                "length": length,
+                "content_type": content_type,
+                "refcount": 1,
+                "created_at": datetime.utcnow()
+            })
+            UPLOADS.inc(outcome="new")
+            return file_id
+        except DuplicateKeyError:
+            pass
+
+        existing = blobs.find_one_and_update(
+            {"_id": sha256}, {"$inc": {"refcount": 1}}, return_document=ReturnDocument.AFTER
+        )
+        if existing is not None:
+            file_storage.get_bucket().delete(file_id)
+            UPLOADS.inc(outcome="duplicate")
+            BYTES_DEDUPLICATED.inc(length)
+            return existing["file_id"]
+        # The blob was released between the two calls; try inserting again
+
+
+def _release(sha256):
+    """Drop one reference; delete the content and its derivatives with the last one"""
+    from pymongo import ReturnDocument
+
+    blobs = get_blobs_collection()
+    blob = blobs.find_one_and_update(
+        {"_id": sha256}, {"$inc": {"refcount": -1}}, return_document=ReturnDocument.AFTER
+    )
+    if blob is None or blob["refcount"] > 0:
+        return
+    # Only delete if no upload re-referenced the blob in the meantime
+    if blobs.find_one_and_delete({"_id": sha256, "refcount": {"$lte": 0}}) is None:
+        return
+
+    bucket = file_storage.get_bucket()
+    bucket.delete(blob["file_id"])
+    derived = get_derived_collection()
+    for artifact in derived.find({"sha256": sha256}, {"file_id": 1}):
+        bucket.delete(artifact["file_id"])
+    derived.delete_many({"sha256": sha256})
+    logger.info("Deleted unreferenced blob %s", sha256)
+
+
+def _add_reference(sha256, file_id, length, owner, filename, content_type):
+    kept_id = _attach(sha256, file_id, length, content_type)
+    try:
+        result = get_file_refs_collection().insert_one({
+            "owner": owner,
+            "filename": filename,
+            "content_type": content_type,
+            "length": length,
+            "sha256": sha256,
+            "created_at": datetime.utcnow()
+        })
+    except Exception:
+        _release(sha256)
+        raise
+    logger.info("Stored %s for %s (%s)", filename, owner, "new" if kept_id == file_id else "duplicate",
+                extra={"msg_type": "files.stored", "sha256": sha256})
+    return result.inserted_id
+
+
+def upload_stream(stream, filename, content_type, owner):
+    """Store an upload content-addressed; returns ``(ref_id, length)``"""
+    file_id, length, sha256 = file_storage.store_stream(stream, filename, content_type, owner)
+    return _add_reference(sha256, file_id, length, owner, filename, content_type), length
+
+
+def complete_resumable(upload_id, owner):
+    """Finish a resumable upload and store it content-addressed; returns the ref id"""
+    session = file_storage.get_upload(upload_id, owner)
+    if session is None:
+        raise file_storage.UploadError("Unknown or expired upload")
+    file_id, length, sha256 = file_storage.complete_upload(upload_id, owner)
+    return _add_reference(sha256, file_id, length, owner, session["filename"], session["content_type"])
+
+
+def get_reference(ref_id, owner):
+    return get_file_refs_collection().find_one({"_id": ref_id, "owner": owner})
+
+
+def open_content(ref):
+    """fs.files document holding the content of a file ref"""
+    blob = get_blobs_collection().find_one({"_id": ref["sha256"]}, {"file_id": 1})
+    return file_storage.get_file(blob["file_id"]) if blob else None
+
+
+def remove_reference(ref_id, owner):
+    ref = get_file_refs_collection().find_one_and_delete({"_id": ref_id, "owner": owner})
+    if ref is None:
+        return False
+    _release(ref["sha256"])
+    return True
+
+
+def derived(sha256, kind, params, build):
+    """Derived artifact of a blob, built with ``build(source_file)`` only on a miss.
+
+    ``build`` gets a seekable GridOut of the source and returns
+    ``(bytes, content_type)``. Returns the ``derived_artifacts`` document.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    params_key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+    key = f"{sha256}:{kind}:{params_key}"
+    collection = get_derived_collection()
+
+    artifact = collection.find_one({"_id": key})
+    if artifact is not None:
+        DERIVED_REQUESTS.inc(kind=kind, result="hit")
+        return artifact
+    DERIVED_REQUESTS.inc(kind=kind, result="miss")
+
+    blob = get_blobs_collection().find_one({"_id": sha256}, {"file_id": 1})
+    if blob is None:
+        raise LookupError(f"No blob {sha256}")
+    source = file_storage.get_bucket().open_download_stream(blob["file_id"])
+    try:
+        data, content_type = build(source)
+    finally:
+        source.close()
+
+    file_id = file_storage.store_bytes(io.BytesIO(data), f"{kind}-{sha256[:12]}", content_type)
+    artifact = {
+        "_id": key,
+        "sha256": sha256,
+        "kind": kind,
+        "params": params,
+        "file_id": file_id,
+        "content_type": content_type,
+        "length": len(data),
+        "created_at": datetime.utcnow()
+    }
+    try:
+        collection.insert_one(artifact)
+    except DuplicateKeyError:
+        # Built concurrently by another worker; keep theirs
+        file_storage.get_bucket().delete(file_id)
+        artifact = collection.find_one({"_id": key})
+    return artifact
+
+
+def _build_thumbnail(size):
+    def build(source):
+        from PIL import Image
+
+        try:
+            with Image.open(source) as image:
+                image.thumbnail((size, size))
+                output = io.BytesIO()
+                image.convert("RGB").save(output, format="JPEG", quality=80, optimize=True)
+        except (OSError, Image.DecompressionBombError) as e:
+            # UnidentifiedImageError and truncated files are OSErrors
+            raise UnsupportedImage(str(e)) from e
+        return output.getvalue(), "image/jpeg"
+    return build
+
+
+def thumbnail(ref, size=256):
+    """JPEG thumbnail of an image file ref (needs Pillow), cached per content.
+
+    Raises UnsupportedImage when the content is not a decodable image; the
+    content type is client-supplied and proves nothing.
+    """
+    return derived(ref["sha256"], "thumbnail", {"size": size}, _build_thumbnail(size))
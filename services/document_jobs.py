@@ -0,0 +1,267 @@
+# services/document_jobs.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database.mongo import db_connection
+from services import document_templates
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOBS_TOTAL = registry.counter(
+    "document_jobs_total",
+    "Document jobs by template and final status (done, failed).",
+    labelnames=("template", "status")
+)
+JOBS_DEFERRED = registry.counter(
+    "document_jobs_deferred_total",
+    "Jobs left queued in MongoDB because every worker slot was taken."
+)
+RENDER_CACHE_HITS = registry.counter(
+    "document_render_cache_hits_total",
+    "Jobs served from an earlier identical job's output instead of rendering.",
+    labelnames=("template",)
+)
+RENDER_SECONDS = registry.histogram(
+    "document_render_duration_seconds",
+    "Time to render one document.",
+    labelnames=("template", "format")
+)
+
+# Finished jobs and their output are removed by a TTL index after this long
+JOB_RETENTION = timedelta(days=int(os.getenv("DOCUMENT_JOB_RETENTION_DAYS", "7")))
+
+# A job still "rendering" after this long belonged to a worker that died
+STALE_AFTER = timedelta(minutes=10)
+
+# A job whose worker died this many times is failed instead of claimed again
+MAX_ATTEMPTS = int(os.getenv("DOCUMENT_MAX_ATTEMPTS", "3"))
+
+# Fields returned by status lookups; the rendered output is only read by downloads
+STATUS_FIELDS = {
+    "template_id": 1, "format": 1, "status": 1, "progress": 1, "error": 1,
+    "filename": 1, "size": 1, "created_at": 1, "started_at": 1, "finished_at": 1
+}
+
+
+def get_jobs_collection():
+    db = db_connection.get_db()
+    return db['jobs']
+
+
+def create_indexes():
+    jobs = get_jobs_collection()
+    jobs.create_index([("user_email", 1), ("created_at", -1)])
+    jobs.create_index([("status", 1), ("created_at", 1)])
+    jobs.create_index([("expires_at", 1)], expireAfterSeconds=0)
+    jobs.create_index([("content_key", 1), ("status", 1)])
+
+
+def _set_progress(job_id, progress, **fields):
+    get_jobs_collection().update_one({"_id": job_id}, {"$set": dict(fields, progress=progress)})
+
+
+def claim(job_id=None):
+    """Atomically move a queued (or stale) job to ``rendering``; None if there is none"""
+    from pymongo import ReturnDocument
+
+    now = datetime.utcnow()
+    query = {"$or": [
+        {"status": "queued"},
+        {"status": "rendering", "started_at": {"$lt": now - STALE_AFTER}, "attempts": {"$lt": MAX_ATTEMPTS}}
+    ]}
+    if job_id is not None:
+        query["_id"] = job_id
+    return get_jobs_collection().find_one_and_update(
+        query,
+        {"$set": {"status": "rendering", "started_at": now, "progress": 10}, "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def fail_exhausted():
+    """Mark stale jobs that already used every attempt as failed"""
+    now = datetime.utcnow()
+    result = get_jobs_collection().update_many(
+        {"status": "rendering", "started_at": {"$lt": now - STALE_AFTER}, "attempts": {"$gte": MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "error": "Rendering was interrupted too many times",
+                  "progress": 100, "finished_at": now, "expires_at": now + JOB_RETENTION}}
+    )
+    if result.modified_count:
+        logger.warning("Failed %d document jobs after %d attempts", result.modified_count, MAX_ATTEMPTS)
+    return result.modified_count
+
+
+def _cached_output(content_key):
+    """Output of a finished job with identical inputs, if one is still retained"""
+    if not content_key:
+        return None
+    return get_jobs_collection().find_one(
+        {"content_key": content_key, "status": "done"},
+        {"result": 1, "mimetype": 1, "filename": 1}
+    )
+
+
+def process(job):
+    """Render a claimed job (or reuse an identical job's output) and store the result"""
+    from bson import Binary
+
+    template_id, fmt = job["template_id"], job["format"]
+    started = time.perf_counter()
+    try:
+        cached = _cached_output(job.get("content_key"))
+        if cached is not None:
+            data, mimetype, filename = bytes(cached["result"]), cached["mimetype"], cached["filename"]
+            RENDER_CACHE_HITS.inc(template=template_id)
+        else:
+            document_templates.get_template(template_id)
+            _set_progress(job["_id"], 40)
+            data, mimetype, filename = document_templates.render_document(template_id, fmt, job["fields"])
+            RENDER_SECONDS.observe(time.perf_counter() - started, template=template_id, format=fmt)
+
+        now = datetime.utcnow()
+        _set_progress(
+            job["_id"], 100,
+            status="done", result=Binary(data), size=len(data), mimetype=mimetype,
+            filename=filename, finished_at=now, expires_at=now + JOB_RETENTION
+        )
+        JOBS_TOTAL.inc(template=template_id, status="done")
+        logger.info("Rendered %s job %s (%d bytes)", template_id, job["_id"], len(data),
+                    extra={"msg_type": "documents.rendered"})
+    except Exception as e:
+        now = datetime.utcnow()
+        _set_progress(job["_id"], 100, status="failed", error=str(e),
+                      finished_at=now, expires_at=now + JOB_RETENTION)
+        JOBS_TOTAL.inc(template=template_id, status="failed")
+        logger.exception("Document job %s failed: %s", job["_id"], e)
+
+
+class DocumentJobEngine:
+    """Renders jobs on a bounded thread pool, outside request threads.
+
+    Every job is written to the ``jobs`` collection before it is scheduled,
+    so the collection is the queue of record. At most ``max_queue`` jobs are
+    handed to the local pool; the rest stay ``queued`` and are picked up by
+    pool threads as they free up, or by ``flask documents-worker``.
+    """
+
+    def __init__(self, workers=4, max_queue=100):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def reset_after_fork(self):
+        """Forget the parent's pool; a forked child starts its own on first submit"""
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    document_templates.precompile()
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="documents")
+        return self._executor
+
+    def submit(self, user_email, template_id, fmt, fields):
+        """Validate and enqueue a job; returns its id. Raises ValueError for bad input."""
+        document_templates.validate(template_id, fmt, fields)
+        spec = document_templates.DOCUMENT_TEMPLATES[template_id]
+        now = datetime.utcnow()
+        result = get_jobs_collection().insert_one({
+            "user_email": user_email,
+            "template_id": template_id,
+            "format": fmt,
+            "fields": {name: str(fields[name]) for name in spec["fields"]},
+            "content_key": document_templates.content_key(template_id, fmt, fields),
+            "status": "queued",
+            "progress": 0,
+            "attempts": 0,
+            "created_at": now,
+            "expires_at": now + JOB_RETENTION
+        })
+        self._schedule(result.inserted_id)
+        return result.inserted_id
+
+    def _schedule(self, job_id):
+        if not self._slots.acquire(blocking=False):
+            JOBS_DEFERRED.inc()
+            return
+        try:
+            self._get_executor().submit(self._run, job_id)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _run(self, job_id):
+        try:
+            job = claim(job_id)
+            if job is not None:
+                process(job)
+            # Drain jobs that were deferred while the pool was full
+            while True:
+                job = claim()
+                if job is None:
+                    break
+                process(job)
+            fail_exhausted()
+        except Exception as e:
+            logger.error("Document worker error: %s", e)
+        finally:
+            self._slots.release()
+
+
+def get_job(job_id, user_email, include_result=False):
+    """A user's job (status fields only unless ``include_result``), or None"""
+    from bson import ObjectId
+
+    if not ObjectId.is_valid(job_id):
+        return None
+    projection = None if include_result else STATUS_FIELDS
+    return get_jobs_collection().find_one({"_id": ObjectId(job_id), "user_email": user_email}, projection)
+
+
+def run_worker(once=False, idle_sleep=1.0):
+    """Process queued jobs until interrupted (or until none are left with ``once``)"""
+    document_templates.precompile()
+    processed = 0
+    while True:
+        job = claim()
+        if job is None:
+            fail_exhausted()
+            if once:
+                return processed
+            time.sleep(idle_sleep)
+            continue
+        process(job)
+        processed += 1
+
+
+engine = DocumentJobEngine(
+    workers=int(os.getenv("DOCUMENT_WORKERS", "4")),
+    max_queue=int(os.getenv("DOCUMENT_MAX_QUEUE", "100"))
+)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=engine.reset_after_fork)
+
+
+def register_commands(app):
+    """Add ``flask documents-worker`` to the app CLI"""
+    import click
+
+    @app.cli.command("documents-worker")
+    @click.option("--once", is_flag=True, help="Exit when no queued jobs are left.")
+    def documents_worker_command(once):
+        """Render queued document jobs."""
+        processed = run_worker(once=once)
+        click.echo(f"✅ Rendered {processed} document jobs")
@@ -0,0 +1,165 @@
+# services/document_templates.py
+"""Document templates and the PDF/DOCX renderers.
+
+Templates live in templates/documents/ as plain-text Jinja files: blank
+lines separate paragraphs and a line starting with ``# `` is a heading.
+They are compiled once per process and reused by every job. PDF output
+needs ``reportlab`` and DOCX output needs ``python-docx``; formats whose
+library is missing are simply not offered.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "documents")
+
+MAX_FIELD_LENGTH = 2000
+
+# template id -> file, title and the fields a job must supply
+DOCUMENT_TEMPLATES = {
+    "affidavit": {
+        "file": "affidavit.txt",
+        "title": "Affidavit",
+        "fields": ["deponent_name", "parent_name", "age", "address", "statement", "place", "date"]
+    },
+    "application_letter": {
+        "file": "application_letter.txt",
+        "title": "Application Letter",
+        "fields": ["applicant_name", "address", "recipient", "subject", "body", "place", "date"]
+    },
+}
+
+FORMATS = {
+    "pdf": {"module": "reportlab", "mimetype": "application/pdf"},
+    "docx": {
+        "module": "docx",
+        "mimetype": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    },
+}
+
+_compiled = {}
+_source_digests = {}
+_compile_lock = threading.Lock()
+
+
+def available_formats():
+    """Output formats whose rendering library is installed"""
+    import importlib.util
+    return [fmt for fmt, spec in FORMATS.items() if importlib.util.find_spec(spec["module"]) is not None]
+
+
+def get_template(template_id):
+    """Compiled Jinja template for ``template_id`` (compiled on first use)"""
+    template = _compiled.get(template_id)
+    if template is None:
+        with _compile_lock:
+            template = _compiled.get(template_id)
+            if template is None:
+                from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+                env = Environment(
+                    loader=FileSystemLoader(TEMPLATE_DIR),
+                    undefined=StrictUndefined,
+                    keep_trailing_newline=True
+                )
+                template = _compiled[template_id] = env.get_template(DOCUMENT_TEMPLATES[template_id]["file"])
+    return template
+
+
+def precompile():
+    """Compile every template up front (called when the job engine starts)"""
+    for template_id in DOCUMENT_TEMPLATES:
+        get_template(template_id)
+
+
+def validate(template_id, fmt, fields):
+    """Raise ValueError when a job request cannot be rendered"""
+    spec = DOCUMENT_TEMPLATES.get(template_id)
+    if spec is None:
+        raise ValueError(f"Unknown template: {template_id}")
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported format: {fmt}")
+    if not isinstance(fields, dict):
+        raise ValueError("fields must be an object")
+
+    missing = [name for name in spec["fields"] if not str(fields.get(name) or "").strip()]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    for name in spec["fields"]:
+        if len(str(fields[name])) > MAX_FIELD_LENGTH:
+            raise ValueError(f"{name} is longer than {MAX_FIELD_LENGTH} characters")
+
+
+def content_key(template_id, fmt, fields):
+    """SHA-256 of everything the output depends on: template source, format and fields"""
+    spec = DOCUMENT_TEMPLATES[template_id]
+    source_digest = _source_digests.get(template_id)
+    if source_digest is None:
+        with open(os.path.join(TEMPLATE_DIR, spec["file"]), "rb") as f:
+            source_digest = _source_digests[template_id] = hashlib.sha256(f.read()).hexdigest()
+    digest = hashlib.sha256(source_digest.encode())
+    digest.update(fmt.encode())
+    digest.update(json.dumps({name: str(fields[name]) for name in spec["fields"]}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def render_blocks(template_id, fields):
+    """Template text as ``[(kind, text)]`` with kind ``heading`` or ``paragraph``"""
+    spec = DOCUMENT_TEMPLATES[template_id]
+    text = get_template(template_id).render({name: str(fields[name]) for name in spec["fields"]})
+
+    blocks = []
+    for chunk in text.split("\n\n"):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        if chunk.startswith("# "):
+            blocks.append(("heading", chunk[2:].strip()))
+        else:
+            blocks.append(("paragraph", chunk))
+    return blocks
+
+
+def _render_pdf(title, blocks):
+    from xml.sax.saxutils import escape
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles = getSampleStyleSheet()
+    story = []
+    for kind, text in blocks:
+        style = styles["Title"] if kind == "heading" else styles["BodyText"]
+        story.append(Paragraph(escape(text).replace("\n", "<br/>"), style))
+        story.append(Spacer(1, 8))
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title=title).build(story)
+    return buffer.getvalue()
+
+
+def _render_docx(title, blocks):
+    from docx import Document
+
+    document = Document()
+    document.core_properties.title = title
+    for kind, text in blocks:
+        if kind == "heading":
+            document.add_heading(text, level=1)
+        else:
+            document.add_paragraph(text)
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def render_document(template_id, fmt, fields):
+    """Render a document; returns ``(data, mimetype, filename)``"""
+    title = DOCUMENT_TEMPLATES[template_id]["title"]
+    blocks = render_blocks(template_id, fields)
+    data = _render_pdf(title, blocks) if fmt == "pdf" else _render_docx(title, blocks)
+    return data, FORMATS[fmt]["mimetype"], f"{template_id}.{fmt}"
@@ -0,0 +1,352 @@
+# services/file_storage.py
+"""GridFS file storage on the shared MongoDB client.
+
+Uploads are read from the request stream one chunk at a time, so a worker
+never holds more than a chunk or two of any file. Resumable uploads write
+``fs.chunks`` documents directly: every full chunk is stored as soon as it
+arrives and only the trailing partial chunk is kept on the upload session
+until more data (or the completion call) comes in. A request claims the
+session (``writer``) before writing chunks, so concurrent appends to the
+same upload are rejected rather than interleaved. Downloads read the
+needed chunks straight from a cursor and slice them for ``Range`` requests.
+
+Every stored file's SHA-256 is computed on the way in; services/blob_store.py
+uses it to keep one copy of identical content.
+"""
+import hashlib
+import logging
+import os
+import unicodedata
+from datetime import datetime, timedelta
+
+from database.mongo import db_connection
+
+logger = logging.getLogger(__name__)
+
+BUCKET = "fs"
+CHUNK_SIZE = 255 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(512 * 1024 * 1024)))
+UPLOAD_SESSION_TTL = timedelta(hours=int(os.getenv("UPLOAD_SESSION_HOURS", "24")))
+
+# A request writing to an upload session holds it this long past its last chunk;
+# after that (e.g. the worker died) another request may take over
+WRITER_LEASE = timedelta(seconds=int(os.getenv("UPLOAD_WRITER_LEASE_SECONDS", "60")))
+
+
+class UploadError(Exception):
+    """Upload rejected: wrong offset, too large or unknown session"""
+
+
+class UploadConflict(UploadError):
+    """Another request is writing the same upload, or already wrote this part"""
+
+
+def clean_filename(name, default="upload"):
+    """Client-supplied file name reduced to a safe base name.
+
+    Drops any directory part and control/format characters and caps the
+    length; non-Latin names are kept as they are.
+    """
+    name = str(name or "").replace("\\", "/").rsplit("/", 1)[-1]
+    name = "".join(c for c in name if not unicodedata.category(c).startswith("C")).strip()[:255]
+    return default if name in ("", ".", "..") else name
+
+
+def get_files_collection():
+    return db_connection.get_db()[f"{BUCKET}.files"]
+
+
+def get_chunks_collection():
+    return db_connection.get_db()[f"{BUCKET}.chunks"]
+
+
+def get_upload_sessions_collection():
+    return db_connection.get_db()['upload_sessions']
+
+
+def get_bucket():
+    import gridfs
+    return gridfs.GridFSBucket(db_connection.get_db(), bucket_name=BUCKET, chunk_size_bytes=CHUNK_SIZE)
+
+
+def create_indexes():
+    """The GridFS indexes (needed because resumable uploads bypass the driver) and session lookups"""
+    get_chunks_collection().create_index([("files_id", 1), ("n", 1)], unique=True)
+    get_files_collection().create_index([("filename", 1), ("uploadDate", 1)])
+    get_files_collection().create_index([("metadata.owner", 1), ("uploadDate", -1)])
+    get_upload_sessions_collection().create_index([("expires_at", 1)])
+
+
+def _read_blocks(stream, size=CHUNK_SIZE):
+    """Yield blocks of up to ``size`` bytes from a file-like stream"""
+    while True:
+        block = stream.read(size)
+        if not block:
+            return
+        yield block
+
+
+def store_stream(stream, filename, content_type=None, owner=None, metadata=None):
+    """Stream ``stream`` into GridFS, hashing it as it goes; returns ``(file_id, length, sha256)``"""
+    bucket = get_bucket()
+    grid_in = bucket.open_upload_stream(
+        filename,
+        metadata=dict(metadata or {}, content_type=content_type, owner=owner)
+    )
+    digest = hashlib.sha256()
+    length = 0
+    try:
+        for block in _read_blocks(stream):
+            length += len(block)
+            if length > MAX_UPLOAD_BYTES:
+                raise UploadError(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+            digest.update(block)
+            grid_in.write(block)
+    except Exception:
+        grid_in.abort()
+        raise
+    grid_in.close()
+    return grid_in._id, length, digest.hexdigest()
+
+
+def start_upload(filename, content_type=None, owner=None, metadata=None):
+    """Open a resumable upload session; returns its id"""
+    from bson import ObjectId
+
+    now = datetime.utcnow()
+    result = get_upload_sessions_collection().insert_one({
+        "file_id": ObjectId(),
+        "filename": filename,
+        "content_type": content_type,
+        "owner": owner,
+        "metadata": metadata or {},
+        "offset": 0,
+        "next_n": 0,
+        "partial": b"",
+        "writer": None,
+        "created_at": now,
+        "expires_at": now + UPLOAD_SESSION_TTL
+    })
+    return result.inserted_id
+
+
+def get_upload(upload_id, owner):
+    return get_upload_sessions_collection().find_one({
+        "_id": upload_id, "owner": owner, "expires_at": {"$gt": datetime.utcnow()}
+    })
+
+
+def _insert_chunk(file_id, n, data):
+    from bson import Binary
+    from pymongo.errors import DuplicateKeyError
+
+    try:
+        get_chunks_collection().insert_one({"files_id": file_id, "n": n, "data": Binary(bytes(data))})
+    except DuplicateKeyError:
+        raise UploadConflict(f"Chunk {n} was already written by another request")
+
+
+def _claim_writer(upload_id, owner, token, offset=None):
+    """Take the session for one writing request; returns the session or None.
+
+    Only one request may write chunks of an upload at a time. ``offset``
+    additionally requires that many bytes to have been received.
+    """
+    from pymongo import ReturnDocument
+
+    now = datetime.utcnow()
+    query = {
+        "_id": upload_id, "owner": owner, "expires_at": {"$gt": now},
+        "$or": [{"writer": None}, {"writer_expires_at": {"$lt": now}}]
+    }
+    if offset is not None:
+        query["offset"] = offset
+    return get_upload_sessions_collection().find_one_and_update(
+        query,
+        {"$set": {"writer": token, "writer_expires_at": now + WRITER_LEASE}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _renew_writer(upload_id, token):
+    result = get_upload_sessions_collection().update_one(
+        {"_id": upload_id, "writer": token},
+        {"$set": {"writer_expires_at": datetime.utcnow() + WRITER_LEASE}}
+    )
+    if result.matched_count != 1:
+        raise UploadConflict("Upload was taken over by another request")
+
+
+def _release_writer(upload_id, token):
+    get_upload_sessions_collection().update_one(
+        {"_id": upload_id, "writer": token}, {"$set": {"writer": None}}
+    )
+
+
+def _claim_failure(upload_id, owner, offset=None):
+    session = get_upload(upload_id, owner)
+    if session is None:
+        return UploadError("Unknown or expired upload")
+    if offset is not None and offset != session["offset"]:
+        return UploadConflict(f"Offset mismatch: expected {session['offset']}")
+    return UploadConflict("Upload is being written by another request")
+
+
+def append_upload(upload_id, owner, offset, stream):
+    """Append the bytes of ``stream`` at ``offset``; returns the new offset.
+
+    ``offset`` must equal the number of bytes already received, and the
+    request claims the session before writing any chunk, so a retried or
+    concurrent request fails with UploadConflict instead of corrupting the file.
+    """
+    import secrets
+    from bson import Binary
+
+    token = secrets.token_hex(8)
+    session = _claim_writer(upload_id, owner, token, offset)
+    if session is None:
+        raise _claim_failure(upload_id, owner, offset)
+
+    try:
+        file_id, n = session["file_id"], session["next_n"]
+        # Chunks left behind by an interrupted earlier append at this offset
+        get_chunks_collection().delete_many({"files_id": file_id, "n": {"$gte": n}})
+
+        buffer = bytearray(session["partial"])
+        received = offset
+        for block in _read_blocks(stream):
+            received += len(block)
+            if received > MAX_UPLOAD_BYTES:
+                raise UploadError(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+            buffer += block
+            while len(buffer) >= CHUNK_SIZE:
+                _renew_writer(upload_id, token)
+                _insert_chunk(file_id, n, buffer[:CHUNK_SIZE])
+                del buffer[:CHUNK_SIZE]
+                n += 1
+
+        result = get_upload_sessions_collection().update_one(
+            {"_id": upload_id, "offset": offset, "writer": token},
+            {"$set": {
+                "offset": received,
+                "next_n": n,
+                "partial": Binary(bytes(buffer)),
+                "writer": None,
+                "expires_at": datetime.utcnow() + UPLOAD_SESSION_TTL
+            }}
+        )
+        if result.modified_count != 1:
+            raise UploadConflict("Upload was taken over by another request")
+        return received
+    except Exception:
+        _release_writer(upload_id, token)
+        raise
+
+
+def complete_upload(upload_id, owner):
+    """Flush the last partial chunk and create the fs.files document.
+
+    The hash of a resumable upload cannot be carried across requests, so it
+    is computed here by reading the stored chunks back once. Returns
+    ``(file_id, length, sha256)``.
+    """
+    import secrets
+    from pymongo.errors import DuplicateKeyError
+
+    token = secrets.token_hex(8)
+    session = _claim_writer(upload_id, owner, token)
+    if session is None:
+        raise _claim_failure(upload_id, owner)
+
+    file_id = session["file_id"]
+    file_doc = {
+        "_id": file_id,
+        "length": session["offset"],
+        "chunkSize": CHUNK_SIZE,
+        "uploadDate": datetime.utcnow(),
+        "filename": session["filename"],
+        "metadata": dict(session["metadata"], content_type=session["content_type"], owner=owner)
+    }
+    try:
+        # Left behind by an earlier completion attempt that did not finish
+        get_chunks_collection().delete_many({"files_id": file_id, "n": {"$gte": session["next_n"]}})
+        if session["partial"]:
+            _insert_chunk(file_id, session["next_n"], session["partial"])
+        try:
+            get_files_collection().insert_one(file_doc)
+        except DuplicateKeyError:
+            pass  # An earlier attempt created it and failed before removing the session
+    except Exception:
+        _release_writer(upload_id, token)
+        raise
+    get_upload_sessions_collection().delete_one({"_id": upload_id})
+
+    digest = hashlib.sha256()
+    for block in iter_file(file_doc):
+        digest.update(block)
+    return file_id, file_doc["length"], digest.hexdigest()
+
+
+def purge_stale_uploads():
+    """Delete expired upload sessions together with the chunks they wrote"""
+    sessions = get_upload_sessions_collection()
+    purged = 0
+    for session in sessions.find({"expires_at": {"$lt": datetime.utcnow()}}, {"file_id": 1}):
+        get_chunks_collection().delete_many({"files_id": session["file_id"]})
+        sessions.delete_one({"_id": session["_id"]})
+        purged += 1
+    return purged
+
+
+def get_file(file_id, owner=None):
+    """fs.files document, optionally restricted to ``owner``"""
+    query = {"_id": file_id}
+    if owner is not None:
+        query["metadata.owner"] = owner
+    return get_files_collection().find_one(query)
+
+
+def iter_file(file_doc, start=0, end=None):
+    """Yield the bytes ``start..end`` (inclusive) of a stored file chunk by chunk"""
+    length = file_doc["length"]
+    end = length - 1 if end is None else min(end, length - 1)
+    if length == 0 or start > end:
+        return
+
+    chunk_size = file_doc["chunkSize"]
+    first_n, last_n = start // chunk_size, end // chunk_size
+    cursor = get_chunks_collection().find(
+        {"files_id": file_doc["_id"], "n": {"$gte": first_n, "$lte": last_n}},
+        {"n": 1, "data": 1}
+    ).sort("n", 1).batch_size(4)
+    try:
+        for chunk in cursor:
+            data = chunk["data"]
+            offset = chunk["n"] * chunk_size
+            yield bytes(data[max(start - offset, 0):end - offset + 1])
+    finally:
+        cursor.close()
+
+
+def store_bytes(data, filename, content_type=None, metadata=None):
+    """Store a small in-memory file (derived artifacts); returns its id"""
+    return get_bucket().upload_from_stream(
+        filename, data, metadata=dict(metadata or {}, content_type=content_type)
+    )
+
+
+def delete_file(file_id, owner=None):
+    if get_file(file_id, owner) is None:
+        return False
+    get_bucket().delete(file_id)
+    return True
+
+
+def register_commands(app):
+    """Add ``flask purge-uploads`` to the app CLI"""
+    import click
+
+    @app.cli.command("purge-uploads")
+    def purge_uploads_command():
+        """Delete expired resumable uploads and their chunks."""
+        click.echo(f"✅ Purged {purge_stale_uploads()} expired uploads")
@@ -0,0 +1,66 @@
+# services/json_provider.py
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+from models.user_model import User
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def encode_default(value):
+    """Encode the types our documents carry that JSON has no native form for"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, User):
+        return value.to_public_dict()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider built on orjson.
+
+    datetimes are encoded natively by orjson as RFC 3339 (naive values are
+    treated as UTC, which is what ``datetime.utcnow()`` stores), ObjectId as
+    its hex string and User as its public fields.
+    """
+
+    option = (orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=encode_default, option=self.option).decode()
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj, default=encode_default, option=self.option)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype="application/json")
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """stdlib fallback with the same type handling as OrjsonProvider"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return (o.isoformat() + "+00:00") if o.tzinfo is None else o.isoformat()
+        if isinstance(o, date):
+            return o.isoformat()
+        return encode_default(o)
+
+
+def init_json(app):
+    """Install the fastest available JSON provider on the app"""
+    provider_class = OrjsonProvider if orjson is not None else MongoJSONProvider
+    app.json = provider_class(app)
+    return app.json
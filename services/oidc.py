@@ -0,0 +1,224 @@
+# services/oidc.py
+"""OpenID Connect discovery and JWKS caching for the OAuth login.
+
+ID tokens returned by the token endpoint are verified locally against the
+provider's JWKS, so login needs no userinfo round-trip. The discovery
+document and the JWKS are cached in process and in the ``meta`` collection
+(so a cold start does not refetch them) for as long as the provider's
+``Cache-Control``/``Expires`` headers allow. An ID token signed with an
+unknown ``kid`` forces one JWKS refresh, rate-limited to one per
+``MIN_REFRESH_INTERVAL``.
+"""
+import logging
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from authlib.integrations.flask_client import FlaskOAuth2App, OAuth
+
+from database.mongo import db_connection
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_MAX_AGE = 24 * 3600
+JWKS_MAX_AGE = 3600
+MIN_MAX_AGE = 60
+MIN_REFRESH_INTERVAL = 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def cache_lifetime(headers, default):
+    """Seconds a response may be cached according to Cache-Control or Expires"""
+    cache_control = headers.get("Cache-Control", "")
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return max(int(match.group(1)), MIN_MAX_AGE)
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return MIN_MAX_AGE
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(parsedate_to_datetime(expires).timestamp() - time.time(), MIN_MAX_AGE)
+        except (TypeError, ValueError):
+            pass
+    return default
+
+
+def http_fetch(url):
+    """GET a JSON document; returns ``(document, max_age or None)``"""
+    import requests
+
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.json(), cache_lifetime(response.headers, None)
+
+
+class OIDCDocumentCache:
+    """Discovery documents and key sets by URL, in memory and in MongoDB"""
+
+    def __init__(self, fetch=http_fetch):
+        self.fetch = fetch
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _collection(self):
+        return db_connection.get_db()['meta']
+
+    def _load_stored(self, url):
+        try:
+            return self._collection().find_one({"_id": "oidc:" + url})
+        except Exception as e:
+            logger.warning("Could not read cached OIDC document %s: %s", url, e)
+            return None
+
+    def _store(self, url, entry):
+        try:
+            self._collection().replace_one({"_id": "oidc:" + url}, entry, upsert=True)
+        except Exception as e:
+            logger.warning("Could not cache OIDC document %s: %s", url, e)
+
+    def get(self, url, default_max_age, force=False):
+        """Cached document for ``url``; ``force`` refetches unless it was fetched very recently"""
+        now = time.time()
+        entry = self._memory.get(url)
+        if entry is None:
+            entry = self._load_stored(url)
+            if entry is not None:
+                self._memory[url] = entry
+
+        if entry is not None:
+            if not force and entry["expires_at"] > now:
+                return entry["document"]
+            if force and now - entry["fetched_at"] < MIN_REFRESH_INTERVAL:
+                return entry["document"]
+
+        with self._lock:
+            current = self._memory.get(url)
+            if current is not None and current is not entry and current["fetched_at"] > now - MIN_REFRESH_INTERVAL:
+                return current["document"]
+
+            document, max_age = self.fetch(url)
+            fetched_at = time.time()
+            entry = {
+                "document": document,
+                "fetched_at": fetched_at,
+                "expires_at": fetched_at + (max_age or default_max_age)
+            }
+            self._memory[url] = entry
+            self._store(url, entry)
+            logger.info("Fetched OIDC document %s (cached for %ds)", url, max_age or default_max_age,
+                        extra={"msg_type": "auth.oidc_fetch"})
+            return document
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+document_cache = OIDCDocumentCache()
+
+
+class CachedOIDCApp(FlaskOAuth2App):
+    """OAuth client whose discovery document and JWKS come from ``document_cache``"""
+
+    def load_server_metadata(self):
+        if self._server_metadata_url and "_loaded_at" not in self.server_metadata:
+            metadata = document_cache.get(self._server_metadata_url, DISCOVERY_MAX_AGE)
+            self.server_metadata.update(metadata)
+            self.server_metadata["_loaded_at"] = time.time()
+        return self.server_metadata
+
+    def fetch_jwk_set(self, force=False):
+        # Called again with force=True when the token's kid is not in the set
+        jwks_uri = self.load_server_metadata().get("jwks_uri")
+        if not jwks_uri:
+            raise RuntimeError("Missing jwks_uri in provider metadata")
+        return document_cache.get(jwks_uri, JWKS_MAX_AGE, force=force)
+
+    def parse_id_token(self, token, nonce, claims_options=None, leeway=120):
+        """Verify the ID token locally (signature, iss, aud, exp, nonce)"""
+        claims_options = dict(claims_options or {})
+        claims_options.setdefault("iss", {"values": [self.load_server_metadata().get("issuer")]})
+        return super().parse_id_token(token, nonce, claims_options=claims_options, leeway=leeway)
+
+
+class CachedOAuth(OAuth):
+    oauth2_client_cls = CachedOIDCApp
+
+
+# Claims the app reads from a login; userinfo is only called when one is missing
+PROFILE_CLAIMS = ("sub", "email", "name", "picture")
+
+
+def login_userinfo(client, token):
+    """Profile claims for a completed login, from the verified ID token when possible"""
+    userinfo = token.get("userinfo")
+    if userinfo and all(userinfo.get(claim) for claim in PROFILE_CLAIMS):
+        return userinfo
+    logger.info("ID token lacks profile claims; calling userinfo", extra={"msg_type": "auth.userinfo"})
+    return client.userinfo(token=token)
+
+
+class LocalOIDCProvider:
+    """In-process stand-in for an OpenID provider, for tests and offline work.
+
+    Serves its discovery document and JWKS through ``fetch`` (install it with
+    ``use_local_provider``) and signs ID tokens with a generated RSA key.
+    ``rotate_key`` switches to a new ``kid`` to exercise JWKS refreshes.
+    """
+
+    def __init__(self, issuer="https://oidc.local", client_id="local-client"):
+        self.issuer = issuer
+        self.client_id = client_id
+        self.discovery_url = issuer + "/.well-known/openid-configuration"
+        self.fetch_count = 0
+        self._keys = []
+        self.rotate_key()
+
+    def rotate_key(self):
+        from authlib.jose import JsonWebKey
+
+        kid = f"local-{len(self._keys) + 1}"
+        self._keys.append(JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": kid}))
+
+    @property
+    def metadata(self):
+        return {
+            "issuer": self.issuer,
+            "authorization_endpoint": self.issuer + "/authorize",
+            "token_endpoint": self.issuer + "/token",
+            "userinfo_endpoint": self.issuer + "/userinfo",
+            "jwks_uri": self.issuer + "/jwks",
+            "id_token_signing_alg_values_supported": ["RS256"]
+        }
+
+    def jwks(self):
+        return {"keys": [key.as_dict(is_private=False) for key in self._keys]}
+
+    def fetch(self, url):
+        self.fetch_count += 1
+        if url == self.discovery_url:
+            return self.metadata, DISCOVERY_MAX_AGE
+        if url == self.metadata["jwks_uri"]:
+            return self.jwks(), JWKS_MAX_AGE
+        raise LookupError(f"Unknown local OIDC URL: {url}")
+
+    def issue_id_token(self, claims, nonce=None, lifetime=300):
+        from authlib.jose import jwt
+
+        now = int(time.time())
+        key = self._keys[-1]
+        payload = dict(claims, iss=self.issuer, aud=self.client_id, iat=now, exp=now + lifetime)
+        if nonce is not None:
+            payload["nonce"] = nonce
+        return jwt.encode({"alg": "RS256", "kid": key.kid}, payload, key).decode()
+
+
+def use_local_provider(app, provider):
+    """Route discovery/JWKS fetches and the Google client registration to ``provider``"""
+    document_cache.fetch = provider.fetch
+    document_cache.clear()
+    app.extensions["oidc_provider"] = provider
+    app.extensions.pop("google_oauth", None)
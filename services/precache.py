@@ -0,0 +1,96 @@
+# services/precache.py
+import hashlib
+import json
+import os
+import re
+
+from flask import current_app, request, url_for
+
+# url_for('static', filename='...') calls inside templates
+_STATIC_REFERENCE = re.compile(r"""url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*['"]([^'"]+)['"]""")
+
+SERVICE_WORKER_PATH = os.path.join("static", "service-worker.js")
+VERSION_PLACEHOLDER = "__PRECACHE_VERSION__"
+PUBLIC_PAGES_PLACEHOLDER = "__PUBLIC_PAGES__"
+
+# Endpoints whose pages carry no per-user data; only these are served
+# stale-while-revalidate by the service worker, every other page is network-first
+PUBLIC_PAGE_ENDPOINTS = ("index",)
+
+
+def template_static_dependencies(app):
+    """Static filenames referenced by any template, sorted"""
+    filenames = set()
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in files:
+            if name.endswith(".html"):
+                with open(os.path.join(root, name), encoding="utf-8") as f:
+                    filenames.update(_STATIC_REFERENCE.findall(f.read()))
+    return sorted(filenames)
+
+
+def _file_digest(app, filename):
+    digest = hashlib.sha256()
+    with open(os.path.join(app.static_folder, filename), "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _build_manifest(app):
+    assets = []
+    fingerprint = hashlib.sha256()
+    for filename in template_static_dependencies(app):
+        if not os.path.isfile(os.path.join(app.static_folder, filename)):
+            continue
+        url = url_for("static", filename=filename)
+        assets.append(url)
+        fingerprint.update(url.encode())
+        fingerprint.update(_file_digest(app, filename).encode())
+
+    pages = [url_for(endpoint) for endpoint in PUBLIC_PAGE_ENDPOINTS]
+    with open(os.path.join(app.root_path, SERVICE_WORKER_PATH), encoding="utf-8") as f:
+        worker_source = f.read().replace(PUBLIC_PAGES_PLACEHOLDER, json.dumps(pages))
+    fingerprint.update(worker_source.encode())
+
+    version = fingerprint.hexdigest()[:12]
+    return {
+        "version": version,
+        "assets": assets,
+        "pages": pages,
+        "worker": worker_source.replace(VERSION_PLACEHOLDER, version)
+    }
+
+
+def precache_manifest():
+    """Versioned list of the templates' static dependencies.
+
+    Built once per process (assets only change with a deploy) and shared by
+    the /precache-manifest.json and /service-worker.js routes.
+    """
+    app = current_app
+    manifest = app.extensions.get("precache_manifest")
+    if manifest is None or app.debug:
+        manifest = app.extensions["precache_manifest"] = _build_manifest(app)
+    return manifest
+
+
+def precache_manifest_response():
+    manifest = precache_manifest()
+    response = current_app.json.response({
+        "version": manifest["version"],
+        "assets": manifest["assets"],
+        "pages": manifest["pages"]
+    })
+    response.set_etag(manifest["version"])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def service_worker_response():
+    manifest = precache_manifest()
+    response = current_app.response_class(manifest["worker"], mimetype="application/javascript")
+    response.headers["Service-Worker-Allowed"] = "/"
+    response.set_etag(manifest["version"])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
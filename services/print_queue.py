@@ -0,0 +1,341 @@
+# services/print_queue.py
+"""MongoDB-backed print queue.
+
+Jobs are ordered by priority, then by a per-user fair sequence number, then
+by age. A user's sequence continues from the queue clock (the sequence of
+the last job handed out), so someone queueing a hundred jobs at once does
+not hold up later users: their jobs interleave one-for-one.
+
+Workers take jobs with ``find_one_and_update`` leases. A lease that is not
+completed or extended in time expires and the job becomes claimable again,
+up to ``MAX_ATTEMPTS``; completing or failing a job only succeeds for the
+worker holding its lease, so a job is never printed twice by two live
+workers. Small jobs for the same printer are claimed together as one batch.
+"""
+import logging
+import os
+import socket
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+from database.mongo import db_connection
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"normal": 0, "express": 1, "urgent": 2}
+
+LEASE_SECONDS = int(os.getenv("PRINT_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.getenv("PRINT_MAX_ATTEMPTS", "3"))
+
+# Spooling must finish well inside a lease, or another worker could claim and print the job again
+SPOOL_TIMEOUT = LEASE_SECONDS // 2
+
+# Jobs of at most this many sheets are batched with others for the same printer
+SMALL_JOB_SHEETS = int(os.getenv("PRINT_SMALL_JOB_SHEETS", "10"))
+BATCH_MAX_JOBS = int(os.getenv("PRINT_BATCH_MAX_JOBS", "20"))
+BATCH_MAX_SHEETS = int(os.getenv("PRINT_BATCH_MAX_SHEETS", "100"))
+
+DEFAULT_PRINTER = os.getenv("PRINT_DEFAULT_PRINTER", "default")
+PRINT_COMMAND = os.getenv("PRINT_COMMAND", "lp")
+
+CLOCK_ID = "print_queue_clock"
+
+JOBS_SUBMITTED = registry.counter(
+    "print_jobs_submitted_total", "Print jobs queued by priority.", labelnames=("priority",)
+)
+JOBS_FINISHED = registry.counter(
+    "print_jobs_finished_total", "Print jobs finished by printer and status (printed, failed).",
+    labelnames=("printer", "status")
+)
+SHEETS_PRINTED = registry.counter(
+    "print_sheets_total", "Sheets printed by printer.", labelnames=("printer",)
+)
+LEASES_RECLAIMED = registry.counter(
+    "print_leases_reclaimed_total", "Jobs claimed again after a worker's lease expired."
+)
+BATCH_SIZE = registry.histogram(
+    "print_batch_jobs", "Jobs per claimed batch.", buckets=(1, 2, 5, 10, 20, 50)
+)
+QUEUE_WAIT = registry.histogram(
+    "print_queue_wait_seconds", "Time from submission to claim.",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+BATCH_SECONDS = registry.histogram(
+    "print_batch_duration_seconds", "Time to print one batch.", labelnames=("printer",)
+)
+
+CLAIM_ORDER = [("priority", -1), ("fair_seq", 1), ("created_at", 1)]
+
+
+def get_print_jobs_collection():
+    db = db_connection.get_db()
+    return db['print_jobs']
+
+
+def create_indexes():
+    jobs = get_print_jobs_collection()
+    jobs.create_index([("status", 1), ("printer", 1), ("priority", -1), ("fair_seq", 1), ("created_at", 1)])
+    # Claims for any printer: each $or branch reads this index in CLAIM_ORDER and they are merge-sorted
+    jobs.create_index([("status", 1), ("priority", -1), ("fair_seq", 1), ("created_at", 1)])
+    jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    jobs.create_index([("user_email", 1), ("created_at", -1)])
+    jobs.create_index([("batch_id", 1)])
+
+
+def _next_fair_seq(user_email):
+    """Next sequence number for ``user_email``: one past max(their last, queue clock)"""
+    from pymongo import ReturnDocument
+
+    db = db_connection.get_db()
+    clock = db['meta'].find_one({"_id": CLOCK_ID}, {"value": 1}) or {}
+    doc = db['print_fairness'].find_one_and_update(
+        {"_id": user_email},
+        [{"$set": {"seq": {"$add": [{"$max": [{"$ifNull": ["$seq", 0]}, clock.get("value", 0)]}, 1]}}}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["seq"]
+
+
+def submit(user_email, document_job_id, printer=None, copies=1, pages=1, color=False, priority="normal"):
+    """Queue a rendered document for printing; returns the print job id"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+    if not 1 <= copies <= 100 or not 1 <= pages <= 1000:
+        raise ValueError("copies must be 1-100 and pages 1-1000")
+
+    now = datetime.utcnow()
+    result = get_print_jobs_collection().insert_one({
+        "user_email": user_email,
+        "document_job_id": document_job_id,
+        "printer": printer or DEFAULT_PRINTER,
+        "copies": copies,
+        "pages": pages,
+        "sheets": copies * pages,
+        "color": bool(color),
+        "priority": PRIORITIES[priority],
+        "fair_seq": _next_fair_seq(user_email),
+        "status": "queued",
+        "attempts": 0,
+        "created_at": now
+    })
+    JOBS_SUBMITTED.inc(priority=priority)
+    return result.inserted_id
+
+
+def _claimable(now, printer=None, max_sheets=None):
+    query = {
+        "$or": [
+            {"status": "queued"},
+            {"status": "leased", "lease_expires_at": {"$lt": now}}
+        ],
+        "attempts": {"$lt": MAX_ATTEMPTS}
+    }
+    if printer is not None:
+        query["printer"] = printer
+    if max_sheets is not None:
+        query["sheets"] = {"$lte": max_sheets}
+    return query
+
+
+def _claim_one(worker_id, batch_id, now, printer=None, max_sheets=None):
+    from pymongo import ReturnDocument
+
+    job = get_print_jobs_collection().find_one_and_update(
+        _claimable(now, printer, max_sheets),
+        {
+            "$set": {
+                "status": "leased",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "batch_id": batch_id,
+                "claimed_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=CLAIM_ORDER,
+        return_document=ReturnDocument.AFTER
+    )
+    if job is not None:
+        if job["attempts"] > 1:
+            LEASES_RECLAIMED.inc()
+        QUEUE_WAIT.observe((now - job["created_at"]).total_seconds())
+    return job
+
+
+def next_claimable(printer=None):
+    """The job the next claim would lease, without leasing it"""
+    return get_print_jobs_collection().find_one(
+        _claimable(datetime.utcnow(), printer), {"_id": 1}, sort=CLAIM_ORDER
+    )
+
+
+def claim_batch(worker_id, printer=None):
+    """Lease the next job and, if it is small, more small jobs for its printer"""
+    from bson import ObjectId
+
+    now = datetime.utcnow()
+    batch_id = ObjectId()
+    first = _claim_one(worker_id, batch_id, now, printer)
+    if first is None:
+        return []
+
+    batch = [first]
+    sheets = first["sheets"]
+    if sheets <= SMALL_JOB_SHEETS:
+        while len(batch) < BATCH_MAX_JOBS:
+            room = min(SMALL_JOB_SHEETS, BATCH_MAX_SHEETS - sheets)
+            if room <= 0:
+                break
+            job = _claim_one(worker_id, batch_id, now, first["printer"], max_sheets=room)
+            if job is None:
+                break
+            batch.append(job)
+            sheets += job["sheets"]
+
+    db_connection.get_db()['meta'].update_one(
+        {"_id": CLOCK_ID}, {"$max": {"value": max(job["fair_seq"] for job in batch)}}, upsert=True
+    )
+    BATCH_SIZE.observe(len(batch))
+    return batch
+
+
+def _owned(job_ids, worker_id):
+    return {"_id": {"$in": list(job_ids)}, "status": "leased", "lease_owner": worker_id}
+
+
+def extend_lease(job_ids, worker_id):
+    """Push the lease out again; returns how many jobs this worker still holds"""
+    result = get_print_jobs_collection().update_many(
+        _owned(job_ids, worker_id),
+        {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}}
+    )
+    return result.modified_count
+
+
+def complete(job_ids, worker_id):
+    result = get_print_jobs_collection().update_many(
+        _owned(job_ids, worker_id),
+        {"$set": {"status": "printed", "finished_at": datetime.utcnow()},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}}
+    )
+    return result.modified_count
+
+
+def fail(job, worker_id, error):
+    """Requeue a job for another attempt, or mark it failed after MAX_ATTEMPTS"""
+    final = job["attempts"] >= MAX_ATTEMPTS
+    get_print_jobs_collection().update_one(
+        _owned([job["_id"]], worker_id),
+        {"$set": {"status": "failed" if final else "queued", "error": str(error),
+                  "finished_at": datetime.utcnow() if final else None},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}}
+    )
+    if final:
+        JOBS_FINISHED.inc(printer=job["printer"], status="failed")
+
+
+def fail_exhausted():
+    """Mark jobs whose last allowed lease expired as failed"""
+    now = datetime.utcnow()
+    result = get_print_jobs_collection().update_many(
+        {"status": "leased", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "error": "Lease expired too many times", "finished_at": now},
+         "$unset": {"lease_owner": "", "lease_expires_at": ""}}
+    )
+    return result.modified_count
+
+
+def cancel(job_id, user_email):
+    """Cancel a job that has not been claimed yet"""
+    result = get_print_jobs_collection().update_one(
+        {"_id": job_id, "user_email": user_email, "status": "queued"},
+        {"$set": {"status": "cancelled", "finished_at": datetime.utcnow()}}
+    )
+    return result.modified_count > 0
+
+
+def get_job(job_id, user_email):
+    return get_print_jobs_collection().find_one({"_id": job_id, "user_email": user_email})
+
+
+def list_jobs(user_email, limit=50):
+    return list(
+        get_print_jobs_collection().find({"user_email": user_email})
+        .sort("created_at", -1)
+        .limit(limit)
+    )
+
+
+def send_to_printer(job, data):
+    """Spool one job through PRINT_COMMAND (CUPS ``lp`` by default)"""
+    command = [PRINT_COMMAND, "-n", str(job["copies"])]
+    if job["printer"] != "default":
+        command += ["-d", job["printer"]]
+    if not job["color"]:
+        command += ["-o", "ColorModel=Gray"]
+    subprocess.run(command, input=data, check=True, capture_output=True, timeout=SPOOL_TIMEOUT)
+
+
+def print_batch(batch, worker_id, printer_fn=send_to_printer):
+    """Print every job of a leased batch; returns the number printed"""
+    from services.document_jobs import get_jobs_collection
+
+    printer = batch[0]["printer"]
+    started = time.perf_counter()
+    printed = []
+    for index, job in enumerate(batch):
+        if not extend_lease([job["_id"]], worker_id):
+            logger.warning("Lost lease on print job %s; skipping", job["_id"])
+            continue
+        # Keep the jobs still waiting in this batch leased while this one spools
+        extend_lease([waiting["_id"] for waiting in batch[index + 1:]], worker_id)
+        try:
+            document = get_jobs_collection().find_one(
+                {"_id": job["document_job_id"], "status": "done"}, {"result": 1}
+            )
+            if document is None:
+                raise ValueError("Document is not available")
+            printer_fn(job, bytes(document["result"]))
+        except Exception as e:
+            logger.error("Print job %s failed: %s", job["_id"], e)
+            fail(job, worker_id, e)
+            continue
+        if complete([job["_id"]], worker_id):
+            printed.append(job)
+            JOBS_FINISHED.inc(printer=printer, status="printed")
+            SHEETS_PRINTED.inc(job["sheets"], printer=printer)
+
+    BATCH_SECONDS.observe(time.perf_counter() - started, printer=printer)
+    return len(printed)
+
+
+def run_worker(printer=None, worker_id=None, once=False, idle_sleep=1.0):
+    """Claim and print batches until interrupted (or the queue is empty with ``once``)"""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    printed = 0
+    while True:
+        fail_exhausted()
+        batch = claim_batch(worker_id, printer)
+        if not batch:
+            if once:
+                return printed
+            time.sleep(idle_sleep)
+            continue
+        printed += print_batch(batch, worker_id)
+
+
+def register_commands(app):
+    """Add ``flask print-worker`` to the app CLI"""
+    import click
+
+    @app.cli.command("print-worker")
+    @click.option("--printer", default=None, help="Only take jobs for this printer.")
+    @click.option("--worker-id", default=None, help="Lease owner name (default: host:pid).")
+    @click.option("--once", is_flag=True, help="Exit when the queue is empty.")
+    def print_worker_command(printer, worker_id, once):
+        """Print queued jobs."""
+        printed = run_worker(printer=printer, worker_id=worker_id, once=once)
+        click.echo(f"✅ Printed {printed} jobs")
@@ -0,0 +1,121 @@
+# services/request_metrics.py
+import contextvars
+import logging
+import os
+import time
+
+from flask import current_app, g, request
+
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "Wall time per Flask endpoint.",
+    labelnames=("endpoint", "method", "status")
+)
+REQUEST_QUANTILES = registry.summary(
+    "http_request_duration_quantiles_seconds",
+    "p50/p95/p99 wall time per Flask endpoint over the most recent requests.",
+    labelnames=("endpoint",)
+)
+REQUEST_MONGO_COMMANDS = registry.histogram(
+    "http_request_mongo_commands",
+    "MongoDB commands issued per request.",
+    labelnames=("endpoint",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+SLOW_REQUESTS = registry.counter(
+    "http_slow_requests_total",
+    "Requests slower than SLOW_REQUEST_MS.",
+    labelnames=("endpoint",)
+)
+
+# Mongo commands of the request being served on this thread:
+# {command name: [count, seconds]}
+_mongo_commands = contextvars.ContextVar("mongo_commands", default=None)
+
+
+def record_mongo_command(command_name, seconds):
+    """Attribute one MongoDB command to the current request (no-op outside one)"""
+    commands = _mongo_commands.get()
+    if commands is None:
+        return
+    entry = commands.get(command_name)
+    if entry is None:
+        commands[command_name] = [1, seconds]
+    else:
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def _endpoint():
+    return request.endpoint or "<unmatched>"
+
+
+def _start_request():
+    g._request_started = time.perf_counter()
+    _mongo_commands.set({})
+
+
+def _record_status(response):
+    g._response_status = response.status_code
+    return response
+
+
+def _finish_request(exc=None):
+    started = g.pop("_request_started", None)
+    if started is None:
+        return
+
+    elapsed = time.perf_counter() - started
+    commands = _mongo_commands.get() or {}
+    _mongo_commands.set(None)
+
+    endpoint = _endpoint()
+    status = g.pop("_response_status", 500 if exc else 200)
+    mongo_calls = sum(count for count, _ in commands.values())
+
+    REQUEST_LATENCY.observe(elapsed, endpoint=endpoint, method=request.method, status=status)
+    REQUEST_QUANTILES.observe(elapsed, endpoint=endpoint)
+    REQUEST_MONGO_COMMANDS.observe(mongo_calls, endpoint=endpoint)
+
+    threshold_ms = current_app.config['SLOW_REQUEST_MS']
+    if threshold_ms and elapsed * 1000 >= threshold_ms:
+        SLOW_REQUESTS.inc(endpoint=endpoint)
+        breakdown = ", ".join(
+            f"{name}×{count} ({seconds * 1000:.1f}ms)"
+            for name, (count, seconds) in sorted(commands.items(), key=lambda item: -item[1][1])
+        ) or "none"
+        logger.warning(
+            "Slow request: %s %s -> %s [%s] %.1fms, %d Mongo calls: %s",
+            request.method, request.path, endpoint, status, elapsed * 1000, mongo_calls, breakdown,
+            extra={"msg_type": "request.slow", "endpoint": endpoint,
+                   "duration_ms": round(elapsed * 1000, 1), "mongo_calls": mongo_calls}
+        )
+
+
+def route_latency_report():
+    """Per-endpoint request count and p50/p95/p99 in milliseconds"""
+    report = {}
+    for (endpoint,), series in REQUEST_QUANTILES.snapshot().items():
+        report[endpoint] = {
+            "count": series["count"],
+            "p50_ms": round(series[0.5] * 1000, 2),
+            "p95_ms": round(series[0.95] * 1000, 2),
+            "p99_ms": round(series[0.99] * 1000, 2)
+        }
+    return report
+
+
+def init_request_metrics(app):
+    """Time every request and trace the slow ones with their Mongo breakdown.
+
+    Requests taking at least ``SLOW_REQUEST_MS`` (default 1000, 0 disables)
+    are logged.
+    """
+    app.config.setdefault('SLOW_REQUEST_MS', float(os.getenv("SLOW_REQUEST_MS", "1000")))
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
@@ -0,0 +1,248 @@
+# services/response_cache.py
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = registry.counter(
+    "response_cache_requests_total",
+    "Response and fragment cache lookups by name and result (hit, miss).",
+    labelnames=("name", "result")
+)
+NOT_MODIFIED = registry.counter(
+    "response_cache_not_modified_total",
+    "Cached views answered with 304 Not Modified.",
+    labelnames=("name",)
+)
+
+# Request properties a cached page may depend on
+DEFAULT_VARY = ("user", "locale")
+
+
+class MemoryCacheBackend:
+    """Per-process LRU of cache entries with per-entry expiry"""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (expires_at, entry)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MongoCacheBackend:
+    """Cache entries in a MongoDB collection shared by every worker.
+
+    Expired documents are removed by a TTL index on ``expires_at``; lookups
+    also filter on it because the TTL monitor only runs once a minute.
+    Failures are logged and treated as misses so the cache never breaks a page.
+    """
+
+    def __init__(self, collection_name="response_cache"):
+        self.collection_name = collection_name
+
+    def _collection(self):
+        from database.mongo import db_connection
+        return db_connection.get_db()[self.collection_name]
+
+    def get(self, key):
+        try:
+            doc = self._collection().find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"entry": 1}
+            )
+        except Exception as e:
+            logger.warning("Response cache read failed: %s", e)
+            return None
+        return doc["entry"] if doc else None
+
+    def set(self, key, entry, ttl):
+        try:
+            self._collection().replace_one(
+                {"_id": key},
+                {"entry": entry, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning("Response cache write failed: %s", e)
+
+    def clear(self):
+        self._collection().delete_many({})
+
+    def create_indexes(self):
+        self._collection().create_index([("expires_at", 1)], expireAfterSeconds=0)
+
+
+def create_backend(name, max_size=1000):
+    """Backend for RESPONSE_CACHE_BACKEND (memory, mongo or none)"""
+    if name == "memory":
+        return MemoryCacheBackend(max_size)
+    if name == "mongo":
+        return MongoCacheBackend()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown response cache backend: {name}")
+
+
+def get_backend():
+    """The app's cache backend, or None when caching is off (always off in debug)"""
+    if current_app.debug:
+        return None
+    return current_app.extensions.get("response_cache")
+
+
+def _digest(value):
+    return hashlib.sha256(repr(value).encode()).hexdigest()[:16]
+
+
+def _locale():
+    locale = session.get("locale") or request.accept_languages.best or "en"
+    return locale.split("-")[0].lower()
+
+
+def _vary_value(name):
+    if name == "user":
+        return _digest(session.get("user"))
+    if name == "locale":
+        return _locale()
+    raise ValueError(f"Unknown cache vary field: {name}")
+
+
+def cache_key(kind, name, parts):
+    """Namespaced key; the asset version makes every deploy start cold"""
+    version = current_app.extensions.get("asset_manifest", {}).get("version") or ""
+    return f"{kind}:{name}:{_digest((version,) + tuple(parts))}"
+
+
+def cached_view(ttl=60, vary=DEFAULT_VARY):
+    """Cache a GET view's 200 responses for ``ttl`` seconds.
+
+    The key covers the view name, its URL arguments, the query string and
+    the request properties listed in ``vary``. Every response carries an
+    ETag of its body and ``no-cache``, so browsers revalidate and get a 304
+    without the page being rendered again. Requests with pending flash
+    messages bypass the cache: the view must run to consume them.
+    """
+    def decorator(view):
+        name = view.__name__
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            backend = get_backend()
+            if backend is None or request.method not in ("GET", "HEAD") or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            parts = [sorted(kwargs.items()), request.query_string]
+            parts.extend(_vary_value(field) for field in vary)
+            key = cache_key("view", name, parts)
+
+            entry = backend.get(key)
+            if entry is not None:
+                CACHE_REQUESTS.inc(name=name, result="hit")
+                response = current_app.response_class(entry["body"], content_type=entry["content_type"])
+            else:
+                CACHE_REQUESTS.inc(name=name, result="miss")
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or "Set-Cookie" in response.headers \
+                        or session.get("_flashes"):
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "content_type": response.content_type,
+                    "etag": hashlib.sha256(body).hexdigest()[:32]
+                }
+                backend.set(key, entry, ttl)
+
+            response.set_etag(entry["etag"])
+            response.cache_control.no_cache = True
+            if "user" in vary:
+                response.cache_control.private = True
+            response.vary.update(("Cookie", "Accept-Language"))
+            response = response.make_conditional(request)
+            if response.status_code == 304:
+                NOT_MODIFIED.inc(name=name)
+            return response
+        return wrapper
+    return decorator
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache ttl, "name", *vary %} ... {% endcache %}`` in templates.
+
+    The rendered block is stored under its name, the extra vary values and
+    the request locale.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache(self, args, caller):
+        ttl, name, *vary = args
+        backend = get_backend()
+        if backend is None:
+            return caller()
+
+        key = cache_key("fragment", name, [str(value) for value in vary] + [_locale()])
+        entry = backend.get(key)
+        if entry is not None:
+            CACHE_REQUESTS.inc(name=name, result="hit")
+            return Markup(entry["body"])
+
+        CACHE_REQUESTS.inc(name=name, result="miss")
+        body = caller()
+        backend.set(key, {"body": str(body)}, ttl)
+        return body
+
+
+def init_response_cache(app):
+    """Pick the backend from RESPONSE_CACHE_* settings and enable {% cache %}"""
+    app.config.setdefault("RESPONSE_CACHE_BACKEND", os.getenv("RESPONSE_CACHE_BACKEND", "memory"))
+    app.config.setdefault("RESPONSE_CACHE_SIZE", int(os.getenv("RESPONSE_CACHE_SIZE", "1000")))
+    app.extensions["response_cache"] = create_backend(
+        app.config["RESPONSE_CACHE_BACKEND"], app.config["RESPONSE_CACHE_SIZE"]
+    )
+    app.jinja_env.add_extension(FragmentCacheExtension)
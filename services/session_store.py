@@ -0,0 +1,125 @@
+# services/session_store.py
+import logging
+import os
+from datetime import datetime, timedelta
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from models.session_model import UserSession
+
+logger = logging.getLogger(__name__)
+
+
+class MongoSession(CallbackDict, SessionMixin):
+    """Session dict that remembers whether it was changed during the request"""
+
+    def __init__(self, initial=None, sid=None, new=False, record=None):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.record = record
+        self.modified = False
+
+
+class MongoSessionInterface(SessionInterface):
+    """Server-side sessions stored through ``UserSession``.
+
+    The cookie only carries a signed session id. Writes are coalesced: the
+    document is rewritten only when the session data changed, and "last
+    seen" plus the expiry extension are written at most once every
+    ``SESSION_REFRESH_MINUTES``. Empty sessions are never stored. When the
+    logged-in user changes (login or logout) the session gets a new id and
+    the old record is deleted, so an id planted before login is worthless.
+    """
+
+    salt = "dastawez-session"
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt, key_derivation="hmac")
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime
+
+    def _refresh_interval(self, app):
+        return timedelta(minutes=app.config.get(
+            "SESSION_REFRESH_MINUTES", float(os.getenv("SESSION_REFRESH_MINUTES", "15"))
+        ))
+
+    @staticmethod
+    def _user_email(data):
+        return (data.get("user") or {}).get("email")
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+
+            if sid:
+                try:
+                    record = UserSession.get_by_id(sid)
+                except Exception as e:
+                    logger.error("Could not load session: %s", e)
+                    record = None
+                if record is not None:
+                    return MongoSession(record.data, sid=sid, record=record)
+
+        return MongoSession(sid=UserSession(None).session_id, new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                UserSession.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + self._lifetime(app)
+        record = session.record
+
+        if record is not None and self._user_email(record.data) != self._user_email(session):
+            # Never carry a session id across a login or logout
+            UserSession.delete(session.sid)
+            session.sid = UserSession(None).session_id
+            record = session.record = None
+
+        if session.modified or record is None:
+            user = session.get("user") or {}
+            record = UserSession(
+                user.get("email"),
+                session_id=session.sid,
+                created_at=record.created_at if record else now,
+                expires_at=expires_at,
+                data=dict(session),
+                last_seen=now
+            )
+            record.save()
+            session.record = record
+        elif now - record.last_seen >= self._refresh_interval(app):
+            record.touch(now, expires_at)
+        else:
+            # Nothing changed and the expiry was extended recently
+            return
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode()).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+        response.vary.add("Cookie")
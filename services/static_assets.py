@@ -0,0 +1,81 @@
+# services/static_assets.py
+import json
+import logging
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = os.path.join("dist", "asset-manifest.json")
+
+# One year; hashed file names change whenever their content does
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def load_asset_manifest(static_folder):
+    """Asset manifest written by build_assets.py, or an empty one"""
+    path = os.path.join(static_folder, MANIFEST_PATH)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        logger.info("No asset manifest at %s; serving unhashed static files", path)
+        return {"version": None, "assets": {}}
+    manifest["by_path"] = {entry["path"]: entry for entry in manifest["assets"].values()}
+    return manifest
+
+
+def asset_manifest():
+    return current_app.extensions["asset_manifest"]
+
+
+def _hashed_static_url(endpoint, values):
+    """url_defaults hook: point url_for('static', filename=...) at the hashed file"""
+    if endpoint != "static":
+        return
+    entry = asset_manifest()["assets"].get(values.get("filename"))
+    if entry is not None:
+        values["filename"] = entry["path"]
+
+
+def _pick_encoding(entry):
+    for encoding in ("br", "gzip"):
+        if encoding in entry["encodings"] and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def send_static(filename):
+    """Static view: hashed files are immutable and served precompressed"""
+    entry = asset_manifest()["by_path"].get(filename)
+    if entry is None:
+        return current_app.send_static_file(filename)
+
+    encoding = _pick_encoding(entry)
+    suffix = {"br": ".br", "gzip": ".gz"}.get(encoding, "")
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    response = send_from_directory(
+        current_app.static_folder,
+        filename + suffix,
+        mimetype=mimetype,
+        conditional=True,
+        etag=entry["etag"] + (f"-{encoding}" if encoding else ""),
+        max_age=IMMUTABLE_MAX_AGE
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if entry["encodings"]:
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_static_assets(app):
+    """Resolve static URLs through the asset manifest and serve hashed files"""
+    app.extensions["asset_manifest"] = load_asset_manifest(app.static_folder)
+    app.url_defaults(_hashed_static_url)
+    app.view_functions["static"] = send_static
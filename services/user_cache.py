@@ -0,0 +1,104 @@
+# services/user_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """In-process read-through cache for User objects.
+
+    Entries are bounded by ``max_size`` (least recently used are evicted
+    first) and expire ``ttl`` seconds after they were stored. Every user is
+    reachable by email and by the string form of its ``_id``; both keys point
+    at the same entry so one invalidation removes both.
+    """
+
+    def __init__(self, max_size=5000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # email -> (expires_at, user)
+        self._ids = {}                 # str(_id) -> email
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_by_email(self, email):
+        with self._lock:
+            return self._get(email)
+
+    def get_by_id(self, user_id):
+        with self._lock:
+            email = self._ids.get(str(user_id))
+            if email is None:
+                self.misses += 1
+                return None
+            return self._get(email)
+
+    def _get(self, email):
+        entry = self._entries.get(email)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._remove(email)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return user
+
+    def set(self, user):
+        if user is None or not user.email:
+            return
+
+        with self._lock:
+            self._remove(user.email)
+            self._entries[user.email] = (time.monotonic() + self.ttl, user)
+            if user.id:
+                self._ids[user.id] = user.email
+
+            while len(self._entries) > self.max_size:
+                oldest_email = next(iter(self._entries))
+                self._remove(oldest_email)
+                self.evictions += 1
+
+    def invalidate(self, email):
+        with self._lock:
+            self._remove(email)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ids.clear()
+
+    def _remove(self, email):
+        entry = self._entries.pop(email, None)
+        if entry is not None:
+            user = entry[1]
+            if user.id:
+                self._ids.pop(user.id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0
+            }
+
+
+# Shared cache instance used by services/user_service.py
+user_cache = UserCache(
+    max_size=int(os.getenv("USER_CACHE_SIZE", "5000")),
+    ttl=int(os.getenv("USER_CACHE_TTL", "300"))
+)
@@ -0,0 +1,145 @@
+# services/user_search.py
+import unicodedata
+
+# Prefixes longer than this are not indexed; longer query terms are
+# truncated to the same length so they still hit the index.
+MAX_PREFIX_LENGTH = 20
+
+# Upper bound on the documents scored for one query. Keeps latency flat for
+# very short queries (e.g. "a") that match a large share of the users;
+# results say when the bound was hit so the client can ask for more letters.
+MAX_CANDIDATES = 1000
+
+def normalize(text):
+    """Case-fold text and strip accents from Latin letters.
+
+    Combining marks are only dropped after an ASCII letter ("José" becomes
+    "jose"); in scripts such as Devanagari the vowel signs are part of the
+    word and are kept.
+    """
+    if not text:
+        return ""
+    kept = []
+    after_ascii = False
+    for c in unicodedata.normalize("NFKD", str(text)):
+        if unicodedata.combining(c):
+            if after_ascii:
+                continue
+        else:
+            after_ascii = c.isascii()
+        kept.append(c)
+    return unicodedata.normalize("NFC", "".join(kept)).casefold()
+
+
+def _is_word_char(c):
+    # Letters and digits of any script, plus the marks that belong to them
+    return c.isalnum() or unicodedata.category(c).startswith("M")
+
+
+def tokenize(text):
+    """Split normalized text into search terms (runs of Unicode letters, digits and marks)"""
+    tokens, current = [], []
+    for c in normalize(text):
+        if _is_word_char(c):
+            current.append(c)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return tokens
+
+
+def build_search_fields(name, email):
+    """Search fields stored on every user document.
+
+    ``search_terms`` holds whole words (used for ranking) plus the full
+    email for the exact-match bonus, and ``search_prefixes`` every prefix of
+    the words (used for matching, backed by a multikey index). Queries are
+    split into words, so the full email needs no prefixes.
+    """
+    words = set(tokenize(name)) | set(tokenize(email))
+    terms = set(words)
+    if email:
+        terms.add(normalize(email))
+
+    prefixes = set()
+    for term in words:
+        for end in range(1, min(len(term), MAX_PREFIX_LENGTH) + 1):
+            prefixes.add(term[:end])
+
+    return {
+        "search_terms": sorted(terms),
+        "search_prefixes": sorted(prefixes)
+    }
+
+
+def query_terms(query):
+    """Terms of a search query, truncated to the indexed prefix length"""
+    terms = []
+    for term in tokenize(query):
+        term = term[:MAX_PREFIX_LENGTH]
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def encode_cursor(score, user_id):
+    return f"{score}:{user_id}"
+
+
+def decode_cursor(cursor):
+    """Return (score, user_id) from a cursor, raising ValueError when malformed"""
+    score, _, user_id = cursor.partition(":")
+    return int(score), user_id
+
+
+def build_search_pipeline(query, projection, limit, after=None):
+    """Aggregation pipeline for a ranked prefix search.
+
+    Candidates come from the ``search_prefixes`` index, are scored by the
+    number of query terms that match a whole word (an exact email match
+    counts once more), and are ordered by score then ``_id`` so pages are
+    stable. At most ``MAX_CANDIDATES`` are scored; the single output
+    document holds the page in ``users`` and ``truncated`` tells whether
+    more documents matched than were scored.
+    """
+    from bson import ObjectId
+
+    terms = query_terms(query)
+    exact = normalize(query).strip()
+
+    page = [
+        {"$limit": MAX_CANDIDATES},
+        {"$addFields": {
+            "_score": {"$add": [
+                {"$size": {"$setIntersection": ["$search_terms", terms]}},
+                {"$cond": [{"$in": [exact, "$search_terms"]}, 1, 0]}
+            ]}
+        }}
+    ]
+
+    if after:
+        score, user_id = decode_cursor(after)
+        page.append({"$match": {"$or": [
+            {"_score": {"$lt": score}},
+            {"_score": score, "_id": {"$gt": ObjectId(user_id)}}
+        ]}})
+
+    page.extend([
+        {"$sort": {"_score": -1, "_id": 1}},
+        {"$limit": limit + 1},
+        {"$project": dict(projection, _score=1)}
+    ])
+
+    return [
+        {"$match": {"search_prefixes": {"$all": terms}}},
+        {"$sort": {"_id": 1}},
+        # One extra candidate only to detect truncation; the page drops it
+        {"$limit": MAX_CANDIDATES + 1},
+        {"$facet": {"users": page, "candidates": [{"$count": "n"}]}},
+        {"$project": {
+            "users": 1,
+            "truncated": {"$gt": [{"$ifNull": [{"$first": "$candidates.n"}, 0]}, MAX_CANDIDATES]}
+        }}
+    ]
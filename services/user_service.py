@@ -1,125 +1,307 @@
 # services/user_service.py
 from database.mongo import db_connection
 from models.user_model import User
+from services.user_cache import user_cache
+from services import user_stats, write_behind
+from services.user_search import build_search_fields, build_search_pipeline, encode_cursor, query_terms
 from datetime import datetime
-import traceback
+import logging
 from bson import ObjectId
 
+logger = logging.getLogger(__name__)
+
 def get_collection():
     """Get users collection with fresh db connection"""
     db = db_connection.get_db()
     return db['users']
 
+def _user_upsert(user_data, tokens=None):
+    """Build the (filter, update) pair that upserts one user by email"""
+    email = user_data.get("email")
+    now = datetime.utcnow()
+
+    user_doc = {
+        "google_id": user_data.get("id"),
+        "name": user_data.get("name"),
+        "email": email,
+        "picture": user_data.get("picture"),
+        "last_login": now,
+        "access_token": tokens.get("access_token") if tokens else None,
+        "refresh_token": tokens.get("refresh_token") if tokens else None
+    }
+    user_doc.update(build_search_fields(user_doc["name"], email))
+
+    return {"email": email}, {"$set": user_doc, "$setOnInsert": {"created_at": now}}
+
 def save_user_data(user_data, tokens=None):
-    """Insert or update user in MongoDB"""
+    """Insert or update user in MongoDB with a single atomic upsert"""
     try:
-        print(f"🔄 Saving user data for: {user_data.get('email')}")
-        
         email = user_data.get("email")
         
         if not email:
-            print("❌ No email provided")
+            logger.warning("save_user_data called without an email", extra={"msg_type": "user.save"})
             return False
             
         users_collection = get_collection()
         
-        # Check if user exists
-        existing = users_collection.find_one({"email": email})
-        
-        # Prepare user document
-        user_doc = {
-            "google_id": user_data.get("id"),
-            "name": user_data["name"],
-            "email": email,
-            "picture": user_data.get("picture"),
-            "last_login": datetime.utcnow(),
-            "access_token": tokens.get("access_token") if tokens else None,
-            "refresh_token": tokens.get("refresh_token") if tokens else None
-        }
-        
-        if existing:
-            # Update existing user
-            result = users_collection.update_one(
-                {"email": email},
-                {"$set": user_doc}
-            )
-            print(f"✅ Updated existing user: {email}, modified: {result.modified_count}")
+        query, update = _user_upsert(user_data, tokens)
+        result = users_collection.update_one(query, update, upsert=True)
+        if login_writer is not None:
+            login_writer.discard(email)
+
+        if result.upserted_id is not None:
+            user_stats.record_users_inserted()
+            logger.info("Inserted new user %s", email, extra={"msg_type": "user.save", "user_id": str(result.upserted_id)})
         else:
-            # Insert new user
-            user_doc['created_at'] = datetime.utcnow()
-            result = users_collection.insert_one(user_doc)
-            print(f"✅ Inserted new user: {email}, id: {result.inserted_id}")
+            logger.info("Updated existing user %s", email, extra={"msg_type": "user.save", "modified": result.modified_count})
         
+        user_cache.invalidate(email)
         return True
         
     except Exception as e:
-        print(f"❌ Error in save_user_data: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error in save_user_data: %s", e)
         return False
 
+def _invalidate_cached(emails):
+    for email in emails:
+        user_cache.invalidate(email)
+
+# Deferred login-activity writes; None when WRITE_BEHIND_ENABLED=0. Guarded by
+# last_login so a deferred update never overwrites a newer synchronous save.
+login_writer = write_behind.from_env(
+    get_collection, "email", on_flushed=_invalidate_cached, guard_field="last_login"
+)
+
+def record_login(user_data, tokens=None):
+    """Persist an OAuth login, deferring routine activity writes.
+
+    First logins and refresh-token changes are written synchronously through
+    save_user_data. Otherwise last_login, the short-lived access token and
+    profile changes go through the write-behind queue and are flushed in
+    batches.
+    """
+    email = user_data.get("email")
+    tokens = tokens or {}
+    existing = get_user_by_email(email) if email else None
+
+    refresh_token = tokens.get("refresh_token")
+    critical = (
+        existing is None
+        or login_writer is None
+        or (refresh_token and refresh_token != existing.refresh_token)
+    )
+    if critical:
+        return save_user_data(user_data, tokens)
+
+    fields = {
+        "last_login": datetime.utcnow(),
+        "access_token": tokens.get("access_token"),
+        "picture": user_data.get("picture")
+    }
+    if user_data.get("name") and user_data["name"] != existing.name:
+        fields["name"] = user_data["name"]
+        fields.update(build_search_fields(user_data["name"], email))
+
+    if not login_writer.enqueue(email, fields):
+        return save_user_data(user_data, tokens)
+    return True
+
+def bulk_save_users(records, batch_size=1000):
+    """Upsert many users with unordered bulk_write calls.
+
+    Each record takes the same shape as ``save_user_data``'s ``user_data``
+    and may carry ``access_token``/``refresh_token``. Returns one result per
+    record, in input order: ``{"index", "email", "status", "error"}`` where
+    status is ``inserted``, ``updated`` or ``error``.
+    """
+    from pymongo import UpdateOne
+    from pymongo.errors import BulkWriteError
+
+    results = [None] * len(records)
+    pending = []  # (record index, UpdateOne)
+
+    for index, record in enumerate(records):
+        email = record.get("email") if isinstance(record, dict) else None
+        if not email:
+            results[index] = {"index": index, "email": email, "status": "error",
+                              "error": "Email is required"}
+            continue
+        query, update = _user_upsert(record, record)
+        pending.append((index, UpdateOne(query, update, upsert=True)))
+
+    users_collection = get_collection()
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        errors = {}
+        try:
+            result = users_collection.bulk_write([op for _, op in batch], ordered=False)
+            upserted = set(result.upserted_ids)
+        except BulkWriteError as e:
+            upserted = {item["index"] for item in e.details.get("upserted", [])}
+            errors = {item["index"]: item.get("errmsg") for item in e.details.get("writeErrors", [])}
+        except Exception as e:
+            logger.error("Error in bulk_save_users batch at %d: %s", start, e)
+            upserted = set()
+            errors = {position: str(e) for position in range(len(batch))}
+
+        for position, (index, _) in enumerate(batch):
+            email = records[index]["email"]
+            if position in errors:
+                results[index] = {"index": index, "email": email, "status": "error",
+                                  "error": errors[position]}
+            else:
+                status = "inserted" if position in upserted else "updated"
+                results[index] = {"index": index, "email": email, "status": status, "error": None}
+            user_cache.invalidate(email)
+        user_stats.record_users_inserted(len(upserted))
+
+    failed = sum(1 for r in results if r["status"] == "error")
+    logger.info("Bulk saved %d users, %d failed", len(records) - failed, failed,
+                extra={"msg_type": "user.bulk_save"})
+    return results
+
 def get_user_by_email(email):
-    """Get user by email from MongoDB"""
+    """Get user by email, served from the user cache when possible"""
     try:
+        user = user_cache.get_by_email(email)
+        if user is not None:
+            return user
+
         users_collection = get_collection()
         user_data = users_collection.find_one({"email": email})
         if user_data:
             user = User.from_dict(user_data)
-            print(f"✅ Found user: {email}")
+            user_cache.set(user)
+            logger.debug("Found user %s", email, extra={"msg_type": "user.lookup"})
             return user
         else:
-            print(f"⚠️ User not found: {email}")
+            logger.debug("User not found: %s", email, extra={"msg_type": "user.lookup"})
             return None
     except Exception as e:
-        print(f"❌ Error in get_user_by_email: {str(e)}")
+        logger.error("Error in get_user_by_email: %s", e)
         return None
 
 def get_user_by_id(user_id):
     """Get user by ObjectId"""
     try:
         if not ObjectId.is_valid(user_id):
-            print(f"❌ Invalid ObjectId: {user_id}")
+            logger.debug("Invalid ObjectId: %s", user_id, extra={"msg_type": "user.lookup"})
             return None
         
+        user = user_cache.get_by_id(user_id)
+        if user is not None:
+            return user
+
         users_collection = get_collection()
         user_data = users_collection.find_one({"_id": ObjectId(user_id)})
         if user_data:
             user = User.from_dict(user_data)
-            print(f"✅ Found user by ID: {user_id}")
+            user_cache.set(user)
+            logger.debug("Found user by ID %s", user_id, extra={"msg_type": "user.lookup"})
             return user
         else:
-            print(f"⚠️ User not found by ID: {user_id}")
+            logger.debug("User not found by ID: %s", user_id, extra={"msg_type": "user.lookup"})
             return None
     except Exception as e:
-        print(f"❌ Error in get_user_by_id: {str(e)}")
+        logger.error("Error in get_user_by_id: %s", e)
         return None
 
+def get_raw_collection():
+    """Users collection returning RawBSONDocument results (decoded on access)"""
+    from bson.codec_options import CodecOptions
+    from bson.raw_bson import RawBSONDocument
+    return get_collection().with_options(
+        codec_options=CodecOptions(document_class=RawBSONDocument)
+    )
+
 def get_all_users():
-    """Get all users from MongoDB"""
+    """Get all users from MongoDB as lazily decoded User objects"""
     try:
-        users_collection = get_collection()
-        users_data = list(users_collection.find().sort("created_at", -1))
-        users = [User.from_dict(user_data) for user_data in users_data]
-        print(f"✅ Found {len(users)} users")
+        users_collection = get_raw_collection()
+        cursor = users_collection.find({}, _projection()).sort("created_at", -1)
+        users = [User.from_raw(raw) for raw in cursor]
+        logger.debug("Found %d users", len(users), extra={"msg_type": "user.list"})
         return users
     except Exception as e:
-        print(f"❌ Error in get_all_users: {str(e)}")
+        logger.error("Error in get_all_users: %s", e)
         return []
 
+# Fields that may be requested through the paginated/streaming user listings.
+# Tokens are deliberately left out so they never leave the data layer.
+PUBLIC_USER_FIELDS = ("google_id", "name", "email", "picture", "created_at", "last_login")
+
+def _projection(fields=None):
+    """Build a find() projection limited to PUBLIC_USER_FIELDS"""
+    selected = [f for f in (fields or PUBLIC_USER_FIELDS) if f in PUBLIC_USER_FIELDS]
+    return {field: 1 for field in selected or PUBLIC_USER_FIELDS}
+
+def get_users_page(limit=50, after=None, fields=None):
+    """Get one page of users, newest first, using keyset pagination on _id.
+
+    ``after`` is the ``_id`` of the last user of the previous page. Returns
+    ``(users, next_cursor)`` where ``next_cursor`` is None on the last page.
+    """
+    users_collection = get_collection()
+    query = {"_id": {"$lt": ObjectId(after)}} if after else {}
+
+    users_data = list(
+        users_collection.find(query, _projection(fields))
+        .sort("_id", -1)
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(users_data) > limit:
+        users_data = users_data[:limit]
+        next_cursor = str(users_data[-1]["_id"])
+    return users_data, next_cursor
+
+def iter_users(after=None, fields=None, limit=None, batch_size=500):
+    """Yield user documents one at a time straight from the cursor"""
+    users_collection = get_collection()
+    query = {"_id": {"$lt": ObjectId(after)}} if after else {}
+
+    cursor = (
+        users_collection.find(query, _projection(fields))
+        .sort("_id", -1)
+        .batch_size(batch_size)
+    )
+    if limit:
+        cursor = cursor.limit(limit)
+    try:
+        for user_data in cursor:
+            yield user_data
+    finally:
+        cursor.close()
+
 def update_user(email, update_data):
     """Update user by email"""
     try:
         users_collection = get_collection()
         # Add updated_at timestamp
         update_data['updated_at'] = datetime.utcnow()
+
+        # Keep search tokens in step with name/email changes
+        if 'name' in update_data or 'email' in update_data:
+            name = update_data.get('name')
+            new_email = update_data.get('email')
+            if name is None or new_email is None:
+                existing = users_collection.find_one({"email": email}, {"name": 1, "email": 1}) or {}
+                name = existing.get('name') if name is None else name
+                new_email = existing.get('email', email) if new_email is None else new_email
+            update_data.update(build_search_fields(name, new_email))
         
         result = users_collection.update_one(
             {"email": email},
             {"$set": update_data}
         )
-        print(f"✅ Updated user {email}: {result.modified_count} modified")
+        user_cache.invalidate(email)
+        if update_data.get('email'):
+            user_cache.invalidate(update_data['email'])
+        logger.info("Updated user %s", email, extra={"msg_type": "user.update", "modified": result.modified_count})
         return result.modified_count > 0
     except Exception as e:
-        print(f"❌ Error in update_user: {str(e)}")
+        logger.error("Error in update_user: %s", e)
         return False
 
 def delete_user(email):
@@ -127,20 +309,72 @@ def delete_user(email):
     try:
         users_collection = get_collection()
         result = users_collection.delete_one({"email": email})
-        print(f"✅ Deleted user {email}: {result.deleted_count} deleted")
+        user_cache.invalidate(email)
+        user_stats.record_users_deleted(result.deleted_count)
+        logger.info("Deleted user %s", email, extra={"msg_type": "user.delete", "deleted": result.deleted_count})
         return result.deleted_count > 0
     except Exception as e:
-        print(f"❌ Error in delete_user: {str(e)}")
+        logger.error("Error in delete_user: %s", e)
         return False
 
+def search_users(query, limit=20, after=None, fields=None):
+    """Ranked prefix search over user names and emails.
+
+    Returns ``(users, next_cursor, truncated)``; pass ``next_cursor`` back
+    as ``after`` to fetch the following page. ``truncated`` is True when the
+    query matched more users than are ranked (see ``MAX_CANDIDATES``).
+    """
+    if not query_terms(query):
+        return [], None, False
+
+    users_collection = get_collection()
+    pipeline = build_search_pipeline(query, _projection(fields), limit, after)
+    result = next(users_collection.aggregate(pipeline), {"users": [], "truncated": False})
+    users_data = result["users"]
+
+    next_cursor = None
+    if len(users_data) > limit:
+        users_data = users_data[:limit]
+        last = users_data[-1]
+        next_cursor = encode_cursor(last["_score"], last["_id"])
+    for user_data in users_data:
+        user_data.pop("_score", None)
+    return users_data, next_cursor, result["truncated"]
+
+def reindex_users(batch_size=1000, rebuild=False):
+    """Backfill search fields for users written before they existed (all users with ``rebuild``)"""
+    from pymongo import UpdateOne
+
+    users_collection = get_collection()
+    query = {} if rebuild else {"search_prefixes": {"$exists": False}}
+    cursor = users_collection.find(query, {"name": 1, "email": 1}).batch_size(batch_size)
+
+    updated = 0
+    batch = []
+    for user_data in cursor:
+        batch.append(UpdateOne(
+            {"_id": user_data["_id"]},
+            {"$set": build_search_fields(user_data.get("name"), user_data.get("email"))}
+        ))
+        if len(batch) >= batch_size:
+            updated += users_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += users_collection.bulk_write(batch, ordered=False).modified_count
+
+    logger.info("Reindexed %d users for search", updated)
+    return updated
+
+def get_cache_stats():
+    """Hit/miss counters and size of the user cache"""
+    return user_cache.stats()
+
 def count_users():
-    """Count total users"""
+    """Count total users from the maintained counters (no collection scan)"""
     try:
-        users_collection = get_collection()
-        count = users_collection.count_documents({})
-        return count
+        return user_stats.total_users()
     except Exception as e:
-        print(f"❌ Error in count_users: {str(e)}")
+        logger.error("Error in count_users: %s", e)
         return 0
 
 def create_indexes():
@@ -155,9 +389,15 @@ def create_indexes():
         
         # Create index on last_login for sorting
         users_collection.create_index([("last_login", -1)])
+
+        # Create index on created_at for the admin listing's sort
+        users_collection.create_index([("created_at", -1)])
+
+        # Multikey index backing prefix search
+        users_collection.create_index([("search_prefixes", 1), ("_id", 1)])
         
-        print("✅ Database indexes created successfully")
+        logger.info("Database indexes created successfully")
         return True
     except Exception as e:
-        print(f"❌ Error creating indexes: {e}")
+        logger.error("Error creating indexes: %s", e)
         return False
\ No newline at end of file
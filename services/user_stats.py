@@ -0,0 +1,164 @@
+# services/user_stats.py
+"""Incrementally maintained user statistics.
+
+The ``stats`` collection holds a ``users`` counters document (total users)
+and one ``signups:<YYYY-MM-DD>`` document per day. user_service adjusts them
+with ``$inc`` whenever a user is inserted or deleted, so totals and signup
+history never need a collection scan. Active-user counts are answered from
+the ``last_login`` index and cached in the ``active_users`` document.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+
+from database.mongo import db_connection
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_ID = "users"
+ACTIVE_ID = "active_users"
+ACTIVE_WINDOWS = (7, 30)
+
+# How long cached active-user counts are served before being recomputed
+ACTIVE_TTL = float(os.getenv("STATS_ACTIVE_TTL", "300"))
+
+
+def get_stats_collection():
+    db = db_connection.get_db()
+    return db['stats']
+
+
+def _day_id(when):
+    return "signups:" + when.strftime("%Y-%m-%d")
+
+
+def _adjust_total(delta, when):
+    """Add ``delta`` to the total; seed a missing counters document from the collection.
+
+    Never upserted through ``$inc``: a document created that way would hold
+    only the users changed since, not the real total.
+    """
+    from pymongo.errors import DuplicateKeyError
+
+    stats = get_stats_collection()
+    update = {"$inc": {"total": delta}, "$set": {"updated_at": when}}
+    if stats.update_one({"_id": COUNTERS_ID}, update).matched_count:
+        return
+    # The users write has already happened, so the count includes it
+    total = db_connection.get_db()['users'].count_documents({})
+    try:
+        stats.insert_one({"_id": COUNTERS_ID, "total": total, "updated_at": when})
+    except DuplicateKeyError:
+        # Another writer seeded first, possibly from a count taken before this
+        # change; apply the delta to its document. Counting this change twice
+        # (when that count did include it) is possible but rare, and
+        # rebuild_counters corrects it.
+        stats.update_one({"_id": COUNTERS_ID}, update)
+
+
+def record_users_inserted(count=1, when=None):
+    """Add ``count`` new users to the total and to the signups of ``when``'s day"""
+    if count <= 0:
+        return
+    when = when or datetime.utcnow()
+    try:
+        _adjust_total(count, when)
+        get_stats_collection().update_one(
+            {"_id": _day_id(when)},
+            {"$inc": {"count": count}, "$setOnInsert": {"day": when.strftime("%Y-%m-%d")}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error("Error recording %d new users: %s", count, e)
+
+
+def record_users_deleted(count=1):
+    if count <= 0:
+        return
+    try:
+        _adjust_total(-count, datetime.utcnow())
+    except Exception as e:
+        logger.error("Error recording %d deleted users: %s", count, e)
+
+
+def total_users():
+    """Total users from the counters document, or the collection's estimate"""
+    doc = get_stats_collection().find_one({"_id": COUNTERS_ID}, {"total": 1})
+    if doc is not None:
+        return doc.get("total", 0)
+    return db_connection.get_db()['users'].estimated_document_count()
+
+
+def signups_per_day(days=30):
+    """``[{"day", "count"}]`` for the last ``days`` days, oldest first, including empty days"""
+    today = datetime.utcnow().date()
+    first = today - timedelta(days=days - 1)
+    ids = [_day_id(first + timedelta(days=i)) for i in range(days)]
+    counts = {
+        doc["_id"]: doc.get("count", 0)
+        for doc in get_stats_collection().find({"_id": {"$in": ids}}, {"count": 1})
+    }
+    return [{"day": day_id.split(":", 1)[1], "count": counts.get(day_id, 0)} for day_id in ids]
+
+
+def _count_active(now):
+    users = db_connection.get_db()['users']
+    return {
+        f"{days}d": users.count_documents({"last_login": {"$gte": now - timedelta(days=days)}})
+        for days in ACTIVE_WINDOWS
+    }
+
+
+def active_users():
+    """Users who logged in within the last 7 and 30 days, recomputed at most every ACTIVE_TTL seconds"""
+    stats = get_stats_collection()
+    now = datetime.utcnow()
+    doc = stats.find_one({"_id": ACTIVE_ID})
+    if doc is not None and (now - doc["computed_at"]).total_seconds() < ACTIVE_TTL:
+        return doc["counts"]
+
+    counts = _count_active(now)
+    stats.replace_one({"_id": ACTIVE_ID}, {"counts": counts, "computed_at": now}, upsert=True)
+    return counts
+
+
+def admin_stats(days=30):
+    """Everything the admin page shows above the user list"""
+    try:
+        return {
+            "total": total_users(),
+            "active": active_users(),
+            "signups": signups_per_day(days)
+        }
+    except Exception as e:
+        logger.error("Error loading admin stats: %s", e)
+        return {"total": None, "active": {}, "signups": []}
+
+
+def rebuild_counters():
+    """Recompute the total and daily signups from the users collection"""
+    from pymongo import ReplaceOne
+
+    db = db_connection.get_db()
+    stats = get_stats_collection()
+    now = datetime.utcnow()
+
+    total = db['users'].count_documents({})
+    stats.replace_one({"_id": COUNTERS_ID}, {"total": total, "updated_at": now}, upsert=True)
+
+    pipeline = [
+        {"$match": {"created_at": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "count": {"$sum": 1}
+        }}
+    ]
+    days = [
+        ReplaceOne({"_id": "signups:" + row["_id"]}, {"day": row["_id"], "count": row["count"]}, upsert=True)
+        for row in db['users'].aggregate(pipeline)
+    ]
+    if days:
+        stats.bulk_write(days, ordered=False)
+    stats.delete_one({"_id": ACTIVE_ID})
+    logger.info("Rebuilt user stats: %d users over %d signup days", total, len(days))
+    return total
@@ -0,0 +1,183 @@
+# services/write_behind.py
+import atexit
+import logging
+import os
+import threading
+import time
+
+from services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WRITES_QUEUED = registry.counter(
+    "write_behind_queued_total", "Activity writes accepted by the write-behind queue."
+)
+WRITES_FLUSHED = registry.counter(
+    "write_behind_flushed_total", "Documents written by write-behind flushes."
+)
+FLUSH_BATCHES = registry.counter(
+    "write_behind_batches_total", "bulk_write calls issued by the write-behind queue."
+)
+FLUSH_FAILURES = registry.counter(
+    "write_behind_failures_total", "Write-behind flushes that failed and were re-queued."
+)
+PENDING = registry.gauge(
+    "write_behind_pending", "Documents waiting in the write-behind queue."
+)
+
+
+class WriteBehindQueue:
+    """Buffers ``$set`` updates per document and flushes them with bulk_write.
+
+    Updates for the same key are merged, so a burst of logins by one user
+    becomes a single write. A flush happens when ``max_batch`` keys are
+    pending, every ``flush_interval`` seconds, and at interpreter exit.
+    Failed flushes are put back (without overwriting newer values) and
+    retried. ``enqueue`` returns False when ``max_pending`` is reached; the
+    caller must then write synchronously.
+
+    With ``guard_field`` (a timestamp every update carries), an update is
+    only applied while the stored value is older than its own, so a batch
+    already taken by ``flush`` cannot overwrite a newer synchronous write.
+    """
+
+    def __init__(self, get_collection, key_field, max_batch=500, flush_interval=2.0,
+                 max_pending=10000, on_flushed=None, guard_field=None):
+        self.get_collection = get_collection
+        self.key_field = key_field
+        self.guard_field = guard_field
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_flushed = on_flushed
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        atexit.register(self.close)
+
+    def enqueue(self, key, fields):
+        with self._lock:
+            if self._stopped:
+                return False
+            current = self._pending.get(key)
+            if current is None:
+                if len(self._pending) >= self.max_pending:
+                    return False
+                self._pending[key] = dict(fields)
+            else:
+                current.update(fields)
+            pending = len(self._pending)
+            self._ensure_worker()
+
+        WRITES_QUEUED.inc()
+        PENDING.set(pending)
+        if pending >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    def _filter(self, key, fields):
+        query = {self.key_field: key}
+        if self.guard_field and self.guard_field in fields:
+            # Also matches documents that do not have the field yet
+            query[self.guard_field] = {"$not": {"$gte": fields[self.guard_field]}}
+        return query
+
+    def discard(self, key):
+        """Drop a pending update, e.g. because a newer synchronous write covers it"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _ensure_worker(self):
+        # Also restarts the thread in a forked child, where it is not alive
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Write-behind flush failed: %s", e)
+
+    def flush(self):
+        """Write everything pending now; returns the number of documents written"""
+        from pymongo import UpdateOne
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            written = 0
+            items = list(batch.items())
+            try:
+                collection = self.get_collection()
+                for start in range(0, len(items), self.max_batch):
+                    chunk = items[start:start + self.max_batch]
+                    collection.bulk_write(
+                        [UpdateOne(self._filter(key, fields), {"$set": fields}) for key, fields in chunk],
+                        ordered=False
+                    )
+                    FLUSH_BATCHES.inc()
+                    written += len(chunk)
+                    if self.on_flushed:
+                        self.on_flushed([key for key, _ in chunk])
+            except Exception:
+                FLUSH_FAILURES.inc()
+                self._requeue(items[written:])
+                raise
+            finally:
+                WRITES_FLUSHED.inc(written)
+                PENDING.set(len(self._pending))
+            return written
+
+    def _requeue(self, items):
+        with self._lock:
+            for key, fields in items:
+                newer = self._pending.get(key)
+                if newer is not None:
+                    fields = dict(fields, **newer)
+                self._pending[key] = fields
+
+    def close(self, timeout=10.0):
+        """Stop the worker and write whatever is still pending"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Write-behind flush at shutdown failed: %s", e)
+                time.sleep(0.5)
+        if self._pending:
+            logger.error("Write-behind dropped %d pending updates at shutdown", len(self._pending))
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+
+def from_env(get_collection, key_field, on_flushed=None, guard_field=None):
+    """WriteBehindQueue configured by WRITE_BEHIND_* variables, or None when disabled"""
+    if os.getenv("WRITE_BEHIND_ENABLED", "1") == "0":
+        return None
+    return WriteBehindQueue(
+        get_collection,
+        key_field,
+        max_batch=int(os.getenv("WRITE_BEHIND_BATCH", "500")),
+        flush_interval=float(os.getenv("WRITE_BEHIND_INTERVAL", "2")),
+        max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000")),
+        on_flushed=on_flushed,
+        guard_field=guard_field
+    )
@@ -1,29 +1,107 @@
 // static/service-worker.js
-const CACHE_NAME = 'dastawez-v1';
-const urlsToCache = [
-  '/',
-  '/static/img/logo.png'
-];
+// Served by the /service-worker.js route, which fills in the precache
+// version (so every asset change installs a new worker) and the public pages.
+const VERSION = '__PRECACHE_VERSION__';
+// Pages without per-user content; only these are ever stored in CacheStorage
+const PUBLIC_PAGES = __PUBLIC_PAGES__;
+const CACHE_PREFIX = 'dastawez-';
+const PRECACHE = `${CACHE_PREFIX}precache-${VERSION}`;
+const PAGES_CACHE = `${CACHE_PREFIX}pages-${VERSION}`;
+const PRECACHE_MANIFEST_URL = '/precache-manifest.json';
+const HASHED_ASSET_PREFIX = '/static/dist/';
 
-// Install
+// Install: cache every static dependency listed in the precache manifest
 self.addEventListener('install', event => {
-  console.log('Service Worker: Installing...');
   event.waitUntil(
-    caches.open(CACHE_NAME)
-      .then(cache => {
-        console.log('Caching files');
-        return cache.addAll(urlsToCache);
-      })
+    fetch(PRECACHE_MANIFEST_URL, { cache: 'no-store' })
+      .then(response => response.json())
+      .then(manifest => caches.open(PRECACHE).then(cache => cache.addAll(manifest.assets)))
+      .then(() => self.skipWaiting())
   );
 });
 
-// Fetch
-self.addEventListener('fetch', event => {
-  event.respondWith(
-    caches.match(event.request)
-      .then(response => {
-        // Return cached version or fetch from network
-        return response || fetch(event.request);
-      })
+// Activate: drop caches left behind by previous versions
+self.addEventListener('activate', event => {
+  const current = [PRECACHE, PAGES_CACHE];
+  event.waitUntil(
+    caches.keys()
+      .then(names => Promise.all(
+        names
+          .filter(name => name.startsWith(CACHE_PREFIX) && !current.includes(name))
+          .map(name => caches.delete(name))
+      ))
+      .then(() => self.clients.claim())
+  );
+});
+
+// Hashed assets never change, so the cached copy is always right
+function cacheFirst(request) {
+  return caches.open(PRECACHE).then(cache =>
+    cache.match(request).then(cached => cached || fetch(request).then(response => {
+      if (response.ok) {
+        cache.put(request, response.clone());
+      }
+      return response;
+    }))
+  );
+}
+
+// Public pages render instantly from cache and are refreshed in the background
+function staleWhileRevalidate(event) {
+  const request = event.request;
+  return caches.open(PAGES_CACHE).then(cache =>
+    cache.match(request).then(cached => {
+      const network = fetch(request)
+        .then(response => {
+          // Redirects (e.g. logged out) must not be replayed from cache
+          if (response.ok && !response.redirected && response.type === 'basic') {
+            cache.put(request, response.clone());
+          } else {
+            cache.delete(request);
+          }
+          return response;
+        })
+        .catch(() => cached);
+      event.waitUntil(network.then(() => undefined, () => undefined));
+      return cached || network;
+    })
   );
-});
\ No newline at end of file
+}
+
+// Signed-in pages always come from the network and are never stored, so
+// another user of the device (or an expired session) cannot see them.
+// Offline, fall back to the cached home page.
+function networkFirst(request) {
+  return fetch(request).catch(() =>
+    caches.open(PAGES_CACHE).then(cache => cache.match(PUBLIC_PAGES[0]))
+      .then(cached => cached || Response.error())
+  );
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  if (request.method !== 'GET') {
+    return;
+  }
+
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (url.pathname === '/logout') {
+    // Never show a signed-in page from cache after logging out
+    event.waitUntil(caches.delete(PAGES_CACHE));
+    return;
+  }
+
+  if (request.mode === 'navigate') {
+    if (PUBLIC_PAGES.includes(url.pathname)) {
+      event.respondWith(staleWhileRevalidate(event));
+    } else {
+      event.respondWith(networkFirst(request));
+    }
+  } else if (url.pathname.startsWith(HASHED_ASSET_PREFIX)) {
+    event.respondWith(cacheFirst(request));
+  }
+});